@@ -0,0 +1,30 @@
+"""Add updated_at to notes
+
+Revision ID: 7f3b9d2e6a14
+Revises: c41d7e9a2b58
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3b9d2e6a14'
+down_revision: Union[str, Sequence[str], None] = 'c41d7e9a2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Бар жазбалар үшін ETag жасалған уақыттан басталады
+    op.execute("UPDATE notes SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'updated_at')
@@ -0,0 +1,31 @@
+"""Add a code-point ordered username index for admin user listing
+
+Revision ID: b6d2f4a8c913
+Revises: e5a8c3f17b90
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f4a8c913'
+down_revision: Union[str, Sequence[str], None] = 'e5a8c3f17b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /admin/users: префикс диапазоны мен keyset реті locale-ге емес, код нүктелеріне сүйенеді.
+    # CONCURRENTLY: users-ке жазу бөгелмейді (транзакциядан тыс, autocommit блогында).
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY ix_users_username_c ON users (username COLLATE "C")')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_username_c', table_name='users', postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""Add full-text search to notes
+
+Revision ID: c41d7e9a2b58
+Revises: 5a7419c99f6c
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e9a2b58'
+down_revision: Union[str, Sequence[str], None] = '5a7419c99f6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Генерацияланған баған: мәтін өзгергенде tsvector-ды Postgres өзі жаңартады
+    op.execute(
+        "ALTER TABLE notes ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED"
+    )
+    op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_using='gin')
+    op.drop_column('notes', 'search_vector')
@@ -0,0 +1,47 @@
+"""Add per-owner ordering indexes to notes
+
+Revision ID: e5a8c3f17b90
+Revises: 7f3b9d2e6a14
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8c3f17b90'
+down_revision: Union[str, Sequence[str], None] = '7f3b9d2e6a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /notes/ реті: owner_id = ? ORDER BY created_at DESC, id DESC.
+    # CONCURRENTLY: үлкен кестеде индекс құрылып жатқанда notes-қа жазу бөгелмейді;
+    # транзакция ішінде жұмыс істемейді, сондықтан autocommit блогында.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notes_owner_created_id',
+            'notes',
+            ['owner_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notes_owner_open_created_id',
+            'notes',
+            ['owner_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_completed IS NOT TRUE'),
+            sqlite_where=sa.text('is_completed IS NOT 1'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notes_owner_open_created_id', table_name='notes', postgresql_concurrently=True)
+        op.drop_index('ix_notes_owner_created_id', table_name='notes', postgresql_concurrently=True)
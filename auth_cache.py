@@ -0,0 +1,75 @@
+# auth_cache.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from prometheus_client import Counter
+from sqlalchemy import event, inspect
+import models
+from config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Аутентификацияланған қолданушының жеңіл, өзгермейтін көрінісі."""
+    id: int
+    username: str
+    role: str
+
+
+principal_cache_hits = Counter("auth_principal_cache_hits_total", "Principal кэшінен табылған сұраныстар")
+principal_cache_misses = Counter("auth_principal_cache_misses_total", "Principal кэшінде табылмай, БД-ға барған сұраныстар")
+
+
+class PrincipalCache:
+    """TTL-і бар шектеулі LRU кэш, кілті — токендегі subject (username)."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+    def get(self, username: str) -> Principal | None:
+        entry = self._entries.get(username)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[username]
+            principal_cache_misses.inc()
+            return None
+
+        self._entries.move_to_end(username)
+        principal_cache_hits.inc()
+        return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        self._entries[principal.username] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(settings.auth_cache_max_size, settings.auth_cache_ttl)
+
+
+def invalidate_principal(username: str) -> None:
+    """Рөл өзгергенде немесе қолданушы өшірілгенде шақырылады."""
+    principal_cache.invalidate(username)
+
+
+# ✅ ORM арқылы жасалған өзгерістер кэшті автоматты тазартады.
+# Басқа процестердегі/Core UPDATE өзгерістерін TTL шектейді.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    history = inspect(target).attrs.username.history
+    for username in (target.username, *history.deleted):
+        if username:
+            invalidate_principal(username)
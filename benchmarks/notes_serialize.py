@@ -0,0 +1,96 @@
+"""GET /notes/ бетін құрудың екі жолын салыстыру (10k жол).
+
+orm  — select(Note) -> ORM entity -> NoteOut.model_validate -> to_json(NotePage)
+lean — queries.notes_page_json: тек бағандар (Core жолдары) -> dict -> to_json
+
+Әр жолға шаққандағы CPU уақыты мен tracemalloc бойынша ең жоғарғы жадты шығарады.
+
+    python benchmarks/notes_serialize.py --rows 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic_core import to_json  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+import crud  # noqa: E402
+import queries  # noqa: E402
+import schemas  # noqa: E402
+from database import Base  # noqa: E402
+from models import Note, User  # noqa: E402
+from pagination import encode_cursor  # noqa: E402
+
+OWNER_ID = 1
+
+
+async def orm_page(db: AsyncSession, limit: int) -> bytes:
+    notes = (await db.execute(crud.notes_page_query(OWNER_ID, limit + 1))).scalars().all()
+    next_cursor = None
+    if len(notes) > limit:
+        notes = notes[:limit]
+        next_cursor = encode_cursor(notes[-1].created_at.isoformat(), notes[-1].id)
+    page = schemas.NotePage(items=[schemas.NoteOut.model_validate(note) for note in notes], next_cursor=next_cursor)
+    return to_json(page)
+
+
+async def lean_page(db: AsyncSession, limit: int) -> bytes:
+    return await queries.notes_page_json(db, OWNER_ID, limit)
+
+
+async def run(session_factory, build, rows: int, repeat: int) -> tuple[float, float]:
+    timings = []
+    for _ in range(repeat):
+        async with session_factory() as db:
+            started = time.process_time()
+            await build(db, rows)
+            timings.append(time.process_time() - started)
+
+    async with session_factory() as db:
+        tracemalloc.start()
+        await build(db, rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(timings) / rows * 1e6, peak / rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite+aiosqlite:///notes_serialize_bench.db")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{"id": OWNER_ID, "username": "bench", "role": "user"}])
+        base = datetime(2020, 1, 1)
+        await conn.execute(insert(Note), [
+            {"text": f"Ескертпе мәтіні {i}", "owner_id": OWNER_ID, "created_at": base + timedelta(seconds=i), "is_completed": i % 2 == 0}
+            for i in range(args.rows)
+        ])
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        assert await orm_page(db, 5) == await lean_page(db, 5), "екі жолдың JSON-ы бірдей болуы керек"
+
+    print(f"{'path':>6} {'cpu µs/row':>11} {'peak bytes/row':>15}")
+    for name, build in (("orm", orm_page), ("lean", lean_page)):
+        cpu, memory = await run(session_factory, build, args.rows, args.repeat)
+        print(f"{name:>6} {cpu:>11.2f} {memory:>15.0f}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+# broadcast.py
+import asyncio
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from config import settings
+from dependencies.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], Awaitable[None]]
+
+
+class RedisBroadcast:
+    """Воркерлер арасында хабарлама тарату: әр процесте бір Redis pub/sub жазылымы.
+
+    publish() хабарламаларды буферге жинайды және flush_interval сайын әр арнаға
+    бір PUBLISH (JSON массиві) жібереді. coalesce_key берілсе, бір терезе ішінде
+    сол кілттің тек соңғы хабарламасы жіберіледі. Келген хабарламалар арнаның
+    жергілікті handler-іне беріледі (жариялаушы воркердің өзіне де).
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._handlers: dict[str, Handler] = {}
+        self._pending: dict[str, list[str]] = {}
+        self._coalesced: dict[str, dict[str, str]] = {}
+        self._pending_count = 0
+        self._wakeup = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._listener: asyncio.Task | None = None
+        self._flusher: asyncio.Task | None = None
+
+    def register(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel] = handler
+        if self._listener is not None:
+            # Жаңа арнаға жазылу үшін тыңдаушыны қайта іске қосамыз
+            self._listener.cancel()
+            self._listener = None
+
+    async def start(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def publish(self, channel: str, message: str, coalesce_key: str | None = None) -> None:
+        await self.start()
+        if coalesce_key is None:
+            self._pending.setdefault(channel, []).append(message)
+        else:
+            self._coalesced.setdefault(channel, {})[coalesce_key] = message
+        self._pending_count += 1
+        self._wakeup.set()
+        if self._pending_count >= self.max_batch:
+            self._batch_full.set()
+
+    async def flush(self) -> None:
+        if not self._pending_count:
+            return
+        batches = self._pending
+        for channel, messages in self._coalesced.items():
+            batches.setdefault(channel, []).extend(messages.values())
+        self._pending, self._coalesced, self._pending_count = {}, {}, 0
+
+        pipe = get_redis().pipeline(transaction=False)
+        for channel, messages in batches.items():
+            pipe.publish(channel, json.dumps(messages, ensure_ascii=False))
+        try:
+            await pipe.execute()
+        except Exception:
+            # Redis қолжетімсіз болса, кем дегенде осы воркердің клиенттеріне жеткіземіз
+            logger.warning("Broadcast publish failed, delivering locally", exc_info=True)
+            for channel, messages in batches.items():
+                await self._deliver(channel, messages)
+
+    async def close(self) -> None:
+        for task in (self._listener, self._flusher):
+            if task is not None:
+                task.cancel()
+        self._listener = self._flusher = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.warning("Broadcast flush on shutdown failed", exc_info=True)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Терезе ішінде келген хабарламалар бір PUBLISH-ке жиналады;
+            # буфер max_batch-ке жетсе, терезе біткенше күтпей бірден жіберіледі
+            if self._pending_count < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            self._batch_full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.warning("Broadcast flush failed", exc_info=True)
+
+    async def _listen(self) -> None:
+        if not self._handlers:
+            return
+        while True:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    await self._deliver(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Broadcast subscription lost, reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _deliver(self, channel: str, messages: list[str]) -> None:
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+        for message in messages:
+            try:
+                await handler(message)
+            except Exception:
+                logger.exception("Broadcast handler failed", extra={"channel": channel})
+
+
+broadcaster = RedisBroadcast(
+    flush_interval=settings.ws_broadcast_flush_ms / 1000,
+    max_batch=settings.ws_broadcast_max_batch,
+)
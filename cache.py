@@ -0,0 +1,287 @@
+# cache.py
+import asyncio
+import gzip
+import logging
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from prometheus_client import Counter, Gauge
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+from config import settings
+from database import async_session
+from broadcast import broadcaster
+from local_cache import LocalCache
+from conditional import gzip_etag
+
+logger = logging.getLogger(__name__)
+
+NOTES_CACHE_TTL = 300
+# Жұмсақ TTL өткен соң мән тағы осынша уақыт ескі күйінде беріледі, ал фонда жаңартылады
+NOTES_CACHE_STALE_TTL = 30
+# Кэшті бір процесс қана қайта құрады; басқалары осы уақыт ішінде дайын мәнді күтеді
+NOTES_CACHE_LOCK_TTL = 5.0
+NOTES_CACHE_LOCK_POLL = 0.05
+# Жоқ/бөгде ескертпе ID-лері қысқа уақытқа сақталады (ID-лерді тізіп тексеру DB-ге жетпеуі үшін)
+NOTE_NEGATIVE_CACHE_TTL = 30
+NOTE_NOT_FOUND = b"-"
+
+# Кэш мәнінің бірінші байты — пішімі: "j" дайын JSON, "z" gzip-пен сығылған JSON
+_RAW, _GZIP = b"j", b"z"
+
+
+def _generation_key(user_id: int) -> str:
+    return f"notes:{user_id}:gen"
+
+
+# ✅ L1: Redis алдындағы процесс ішіндегі кэш (тізім беттері және қолданушы буындары).
+# Бет кілттері буынға байланған, сондықтан буынды ұмыту жеткілікті — ескі беттер LRU/TTL арқылы шығады.
+l1_cache = LocalCache(settings.notes_l1_max_bytes, settings.notes_l1_ttl)
+# Әр тазартуда өседі: тазартумен жарысқан Redis оқуы ескі буынды L1-ге жазбауы үшін
+_l1_epoch = 0
+# Буын ~64 байт деп есептеледі
+_GENERATION_SIZE = 64
+
+NOTES_INVALIDATE_CHANNEL = "notes:invalidate"
+
+
+def _forget_generation(user_id: int) -> None:
+    global _l1_epoch
+    _l1_epoch += 1
+    l1_cache.pop(_generation_key(user_id))
+
+
+async def _on_invalidate(message: str) -> None:
+    _forget_generation(int(message))
+
+
+# Басқа воркерлердегі жазулар осы воркердің L1-ін pub/sub арқылы тазартады
+broadcaster.register(NOTES_INVALIDATE_CHANNEL, _on_invalidate)
+
+
+async def notes_generation(redis: Redis, user_id: int) -> int:
+    """Қолданушы ескертпелерінің ағымдағы нұсқасы (кэш кілттері мен ETag осыған байланған)."""
+    key = _generation_key(user_id)
+    generation = l1_cache.get(key)
+    if generation is not None:
+        return generation
+
+    epoch = _l1_epoch
+    generation = await redis.get(key)
+    if generation is None:
+        # Redis тазаланса, буын 0-ден басталмайды: әйтпесе клиенттегі ескі ETag сәйкес келіп қалуы мүмкін
+        await redis.set(key, _initial_generation(), nx=True)
+        generation = await redis.get(key)
+    generation = int(generation)
+    if epoch == _l1_epoch:
+        l1_cache.put(key, generation, size=_GENERATION_SIZE)
+    return generation
+
+
+def _initial_generation() -> int:
+    return time.time_ns() // 1000
+
+
+async def notes_cache_key(redis: Redis, user_id: int, *parts, generation: int | None = None) -> str:
+    """Қолданушының ағымдағы кэш буынына (generation) байланған кілт құрады.
+
+    Буын өзгергенде ескі кілттер оқылмайды және TTL арқылы өздігінен өшеді.
+    """
+    if generation is None:
+        generation = await notes_generation(redis, user_id)
+    return ":".join([f"notes:{user_id}:v{generation}", *map(str, parts)])
+
+
+async def note_cache_key(redis: Redis, user_id: int, note_id: int) -> str:
+    """Жеке ескертпенің кілті де буынға байланған.
+
+    Буын DB сұранысынан бұрын оқылады: толтыру кешігіп, ол аралықта жазу болса,
+    мән ескі буынның кілтіне түседі және оны ешкім оқымайды.
+    """
+    return await notes_cache_key(redis, user_id, "note", note_id)
+
+
+def pack_json(body: bytes) -> bytes:
+    """Жауап денесін кэшке сақтау пішіміне келтіреді (үлкендері сығылады)."""
+    if len(body) >= settings.notes_cache_compress_min_bytes:
+        return _GZIP + gzip.compress(body, mtime=0)
+    return _RAW + body
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Accept-Encoding-ті q-мәндерімен талдайды: "gzip;q=0" — бас тарту, "*" аталмағандарды қамтиды."""
+    gzip_q = any_q = None
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            gzip_q = q
+        elif coding == "*":
+            any_q = q
+    q = gzip_q if gzip_q is not None else any_q
+    return bool(q and q > 0)
+
+
+def cached_json_response(value: bytes, accept_encoding: str = "", headers: dict[str, str] | None = None) -> Response:
+    """Кэштегі мәнді қайта талдамай/сериализацияламай жауап ретінде береді.
+
+    Клиент gzip қабылдаса, сығылған дене сол күйінде жіберіледі; ETag бұл жағдайда
+    gzip нұсқасына тән болады (identity денесінің strong ETag-ымен сәйкес келмеуі үшін).
+    """
+    marker, body = value[:1], value[1:]
+    if marker == _GZIP:
+        # Екі нұсқа да (gzip/identity) кодировкаға тәуелді: аралық кэштер үшін Vary
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        if accepts_gzip(accept_encoding):
+            headers["Content-Encoding"] = "gzip"
+            if "ETag" in headers:
+                headers["ETag"] = gzip_etag(headers["ETag"])
+            return Response(body, media_type="application/json", headers=headers)
+        body = gzip.decompress(body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def invalidate_notes_cache(redis: Redis, user_id: int) -> None:
+    # KEYS/DELETE орнына бір INCR: тізімдер де, жеке ескертпелер де бірге ескіреді, O(1)
+    pipe = redis.pipeline(transaction=False)
+    pipe.set(_generation_key(user_id), _initial_generation(), nx=True)
+    pipe.incr(_generation_key(user_id))
+    await pipe.execute()
+
+    _forget_generation(user_id)
+    await broadcaster.publish(NOTES_INVALIDATE_CHANNEL, str(user_id), coalesce_key=str(user_id))
+
+
+# ✅ Stampede қорғанысы: процесс ішінде single-flight, процестер арасында қысқа Redis құлпы
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+notes_cache_requests = Counter(
+    "notes_cache_requests_total",
+    "Ескертпелер тізімі кэшіне сұраныстар: tier=l1 (hit, miss), tier=redis (hit, miss, stale, coalesced)",
+    ["tier", "result"],
+)
+
+notes_l1_bytes = Gauge("notes_l1_cache_bytes", "L1 кэштің жалпы көлемі (байт, шамамен)")
+notes_l1_bytes.set_function(lambda: l1_cache.size)
+
+notes_l1_entries = Gauge("notes_l1_cache_entries", "L1 кэштегі жазбалар саны")
+notes_l1_entries.set_function(lambda: len(l1_cache))
+
+Loader = Callable[[AsyncSession], Awaitable[bytes]]
+
+# Сұраныстар күте алатын құрылымдар (_rebuild(wait=True)) — әрқашан мән қайтарады
+_inflight: dict[str, asyncio.Task] = {}
+# Фондық жаңартулар бөлек: олар None-мен аяқталуы мүмкін, сондықтан оларды ешкім күтпейді
+_refreshing: dict[str, asyncio.Task] = {}
+_release_lock = None
+
+
+async def read_through(redis: Redis, key: str, loader: Loader) -> bytes:
+    """Кэштегі мәнді (pack_json пішімінде) қайтарады, болмаса бір рет қана құрады.
+
+    Алдымен L1 (процесс жады) тексеріледі, одан кейін Redis.
+    Жұмсақ TTL өткен мән бірден қайтарылады және фонда жаңартылады (stale-while-revalidate).
+    Бір кілтке қатар келген сұраныстар бір құрылымды күтеді: процесс ішінде ортақ task,
+    процестер арасында NX құлпы. loader DB-ден жауап денесін (JSON байттары) құрады;
+    оған жеке сессия беріледі, себебі құрылым оны бастаған сұраныстан ұзақ жасауы мүмкін.
+    """
+    value = l1_cache.get(key)
+    if value is not None:
+        notes_cache_requests.labels("l1", "hit").inc()
+        return value
+    notes_cache_requests.labels("l1", "miss").inc()
+
+    pipe = redis.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.pttl(key)
+    value, ttl_ms = await pipe.execute()
+
+    if value is not None:
+        if ttl_ms > NOTES_CACHE_STALE_TTL * 1000:
+            notes_cache_requests.labels("redis", "hit").inc()
+        else:
+            notes_cache_requests.labels("redis", "stale").inc()
+            if key not in _inflight and key not in _refreshing:
+                _track(_refreshing, key, asyncio.create_task(_refresh_in_background(redis, key, loader)))
+        l1_cache.put(key, value)
+        return value
+
+    task = _inflight.get(key)
+    if task is None:
+        notes_cache_requests.labels("redis", "miss").inc()
+        task = _track(_inflight, key, asyncio.create_task(_rebuild(redis, key, loader, wait=True)))
+    else:
+        notes_cache_requests.labels("redis", "coalesced").inc()
+    # shield: бір клиент ажыраса да, құрылым басқалары үшін жалғасады
+    value = await asyncio.shield(task)
+    if value is None:
+        value = await _rebuild(redis, key, loader, wait=True)
+    l1_cache.put(key, value)
+    return value
+
+
+def _track(tasks: dict[str, asyncio.Task], key: str, task: asyncio.Task) -> asyncio.Task:
+    tasks[key] = task
+
+    def done(finished: asyncio.Task) -> None:
+        if tasks.get(key) is finished:
+            del tasks[key]
+        if not finished.cancelled():
+            finished.exception()  # күтуші болмаса да "never retrieved" ескертуі шықпайды
+
+    task.add_done_callback(done)
+    return task
+
+
+async def _refresh_in_background(redis: Redis, key: str, loader: Loader) -> None:
+    try:
+        await _rebuild(redis, key, loader, wait=False)
+    except Exception:
+        logger.warning("Notes cache background refresh failed", exc_info=True)
+
+
+async def _rebuild(redis: Redis, key: str, loader: Loader, wait: bool) -> bytes | None:
+    lock_key = f"{key}:lock"
+    token = secrets.token_hex(8)
+    if not await redis.set(lock_key, token, nx=True, px=int(NOTES_CACHE_LOCK_TTL * 1000)):
+        if not wait:
+            return None  # басқа процесс жаңартып жатыр
+        # Басқа процесс құрып жатыр: дайын мәнді күтеміз, құлып мерзімі өтсе өзіміз құрамыз
+        deadline = time.monotonic() + NOTES_CACHE_LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(NOTES_CACHE_LOCK_POLL)
+            value = await redis.get(key)
+            if value is not None:
+                return value
+        token = None
+
+    try:
+        async with async_session() as db:
+            value = pack_json(await loader(db))
+        await redis.set(key, value, ex=NOTES_CACHE_TTL + NOTES_CACHE_STALE_TTL)
+        return value
+    finally:
+        if token is not None:
+            # Тек өз құлпымызды өшіреміз (мерзімі өтіп, басқа процесс алған болуы мүмкін)
+            await _release_lock_script(redis)(keys=[lock_key], args=[token], client=redis)
+
+
+def _release_lock_script(redis: Redis):
+    global _release_lock
+    if _release_lock is None:
+        _release_lock = redis.register_script(RELEASE_LOCK_SCRIPT)
+    return _release_lock
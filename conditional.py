@@ -0,0 +1,48 @@
+# conditional.py
+from datetime import datetime
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def notes_list_etag(user_id: int, generation: int) -> str:
+    # Тізімнің кез келген беті қолданушы нұсқасы (generation) өзгергенде ғана өзгереді
+    return f'"n{user_id}.{generation}"'
+
+
+def note_etag(note_id: int, updated_at: datetime) -> str:
+    return f'"{note_id}.{updated_at:%Y%m%d%H%M%S%f}"'
+
+
+def gzip_etag(etag: str) -> str:
+    # gzip денесі басқа байттар — strong ETag те басқа болуы керек (RFC 9110 8.8.3)
+    return etag[:-1] + '-gzip"'
+
+
+def etag_matches(request: Request, etag: str) -> str | None:
+    """If-None-Match-те сәйкес келген ETag-ты қайтарады (RFC 9110: "*" немесе тізім).
+
+    Бір ресурстың gzip нұсқасының ETag-ы да сәйкес деп есептеледі: клиент қай нұсқаны
+    алса, 304 жауабы сол ETag-пен қайтарылады.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    if header.strip() == "*":
+        return etag
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in (etag, gzip_etag(etag)):
+            return tag
+    return None
+
+
+def not_modified(etag: str, vary: bool = False) -> Response:
+    headers = etag_headers(etag)
+    if vary:
+        headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    # private: жауап қолданушыға тән; no-cache: клиент әр жолы ETag-пен тексереді
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -1,9 +1,55 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Literal
 
 class Settings(BaseSettings):
     rate_limit: int = Field(default=100, alias="RATE_LIMIT")
     rate_limit_window: int = Field(default=60, alias="RATE_LIMIT_WINDOW")
+    rate_limit_fail_open: bool = Field(default=True, alias="RATE_LIMIT_FAIL_OPEN")
+    # "redis" — әр сұранысқа бір Redis шақыруы, "local" — воркер ішіндегі bucket + фондық синхрондау
+    rate_limit_mode: Literal["redis", "local"] = Field(default="redis", alias="RATE_LIMIT_MODE")
+    rate_limit_sync_interval_ms: int = Field(default=250, alias="RATE_LIMIT_SYNC_INTERVAL_MS")
+    rate_limit_exclude_paths: list[str] = Field(default=["/metrics", "/static"], alias="RATE_LIMIT_EXCLUDE_PATHS")
+    # Жол префиксі -> лимит, мысалы RATE_LIMIT_ROUTES='{"/login": 10}'
+    rate_limit_routes: dict[str, int] = Field(default={}, alias="RATE_LIMIT_ROUTES")
+
+    redis_host: str = Field(default="localhost", alias="REDIS_HOST")
+    redis_port: int = Field(default=6379, alias="REDIS_PORT")
+    redis_db: int = Field(default=0, alias="REDIS_DB")
+    redis_max_connections: int = Field(default=50, alias="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout: float = Field(default=5.0, alias="REDIS_POOL_TIMEOUT")
+    redis_socket_timeout: float = Field(default=5.0, alias="REDIS_SOCKET_TIMEOUT")
+
+    auth_cache_max_size: int = Field(default=10000, alias="AUTH_CACHE_MAX_SIZE")
+    auth_cache_ttl: float = Field(default=60.0, alias="AUTH_CACHE_TTL")
+
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=4, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_size: int = Field(default=64, alias="PASSWORD_HASH_QUEUE_SIZE")
+
+    # Сәтті сұраныстардың қанша үлесі жазылады (0..1); баяу және 5xx әрқашан жазылады
+    access_log_sample_rate: float = Field(default=1.0, alias="ACCESS_LOG_SAMPLE_RATE")
+    access_log_slow_ms: float = Field(default=500.0, alias="ACCESS_LOG_SLOW_MS")
+
+    # Осы өлшемнен үлкен кэштелген JSON жауаптар Redis-те gzip күйінде сақталады
+    notes_cache_compress_min_bytes: int = Field(default=1024, alias="NOTES_CACHE_COMPRESS_MIN_BYTES")
+    # Redis алдындағы процесс ішіндегі (L1) кэш: жалпы көлем шегі және қысқа TTL
+    notes_l1_max_bytes: int = Field(default=32 * 1024 * 1024, alias="NOTES_L1_MAX_BYTES")
+    notes_l1_ttl: float = Field(default=5.0, alias="NOTES_L1_TTL")
+
+    ws_queue_size: int = Field(default=100, alias="WS_QUEUE_SIZE")
+    ws_close_timeout: float = Field(default=1.0, alias="WS_CLOSE_TIMEOUT")
+    # Воркерлер арасындағы pub/sub: хабарламалар осы аралықта бір PUBLISH-ке жиналады
+    ws_broadcast_flush_ms: float = Field(default=5.0, alias="WS_BROADCAST_FLUSH_MS")
+    ws_broadcast_max_batch: int = Field(default=100, alias="WS_BROADCAST_MAX_BATCH")
+    # SQLAlchemy пулы; db_log_level=INFO әр SQL-ді (логтау кезегі арқылы) жазады
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(default=500, alias="DB_STATEMENT_CACHE_SIZE")
+    db_log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = Field(default="WARNING", alias="DB_LOG_LEVEL")
     # қалғандарын қалдыра бер
 
     model_config = {
@@ -1,9 +1,11 @@
 # crud.py
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from models import User
-from schemas import UserCreate, UserLogin
+from sqlalchemy import insert, update, delete, case, func, literal_column, and_, or_, table, column, tuple_
+from models import User, Note
+from schemas import UserCreate, UserLogin, NoteCreate
 from fastapi import HTTPException
+from datetime import datetime
 
 async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(select(User).where(User.username == username))
@@ -26,3 +28,128 @@ async def login_user(db: AsyncSession, user: UserLogin):
     if not db_user or db_user.password != user.password:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return db_user
+
+# ✅ GET /notes/ сұранысы: WHERE/ORDER BY ix_notes_owner_created_id индексінің ретімен,
+# сондықтан кесте өскенде де бет индекстен сорттаусыз оқылады (asc — индекс кері бағытта)
+def notes_page_query(
+    owner_id: int,
+    limit: int,
+    after: tuple | None = None,
+    *,
+    completed: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    ascending: bool = False,
+    columns: tuple = (Note,),
+):
+    stmt = select(*columns).where(Note.owner_id == owner_id)
+    if completed is not None:
+        # IS NOT TRUE — ix_notes_owner_open_created_id жартылай индексінің шарты (NULL да кіреді)
+        stmt = stmt.where(Note.is_completed.is_(True) if completed else Note.is_completed.is_not(True))
+    if created_after is not None:
+        stmt = stmt.where(Note.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(Note.created_at < created_before)
+    if after:
+        # OFFSET орнына (created_at, id) бойынша keyset: терең беттер де бірдей арзан
+        position = tuple_(Note.created_at, Note.id)
+        stmt = stmt.where(position > after if ascending else position < after)
+    if ascending:
+        return stmt.order_by(Note.created_at, Note.id).limit(limit)
+    return stmt.order_by(Note.created_at.desc(), Note.id.desc()).limit(limit)
+
+# NoteOut/оқиғалар үшін RETURNING арқылы қайтарылатын бағандар
+NOTE_RETURNING = (Note.id, Note.text, Note.created_at, Note.updated_at, Note.is_completed)
+
+# ✅ Бір ескертпеге жазу: әрқайсысы бір SQL statement (SELECT/refresh жоқ), commit-ті шақырушы жасайды
+async def create_note(db: AsyncSession, owner_id: int, note: NoteCreate):
+    result = await db.execute(insert(Note).values(text=note.text, owner_id=owner_id).returning(*NOTE_RETURNING))
+    return result.one()
+
+async def update_note(db: AsyncSession, owner_id: int, note_id: int, values: dict):
+    # Иесі WHERE шартында: бөгде/жоқ ID үшін жол қайтпайды -> 404
+    stmt = (
+        update(Note)
+        .where(Note.id == note_id, Note.owner_id == owner_id)
+        .values(**values)
+        .returning(*NOTE_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.one_or_none()
+
+async def delete_note(db: AsyncSession, owner_id: int, note_id: int) -> bool:
+    stmt = (
+        delete(Note)
+        .where(Note.id == note_id, Note.owner_id == owner_id)
+        .returning(Note.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none() is not None
+
+# ✅ Notes bulk операциялары: әрқайсысы бір SQL statement, commit-ті шақырушы жасайды
+async def bulk_create_notes(db: AsyncSession, owner_id: int, notes: list[NoteCreate]):
+    if not notes:
+        return []
+    # Көп жолды INSERT ... RETURNING, жолдар параметрлер ретімен қайтарылады
+    stmt = insert(Note).returning(*NOTE_RETURNING, sort_by_parameter_order=True)
+    result = await db.execute(stmt, [{"text": note.text, "owner_id": owner_id} for note in notes])
+    return result.all()
+
+async def bulk_update_notes(db: AsyncSession, owner_id: int, texts: dict[int, str]):
+    if not texts:
+        return []
+    stmt = (
+        update(Note)
+        .where(Note.id.in_(texts), Note.owner_id == owner_id)
+        .values(text=case(texts, value=Note.id))
+        .returning(*NOTE_RETURNING)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+async def bulk_delete_notes(db: AsyncSession, owner_id: int, note_ids: list[int]):
+    if not note_ids:
+        return []
+    stmt = (
+        delete(Note)
+        .where(Note.id.in_(note_ids), Note.owner_id == owner_id)
+        .returning(Note.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+# ✅ Толық мәтіндік іздеу: релеванттылық (rank) бойынша кему ретімен, (rank, id) keyset
+def _fts5_query(query: str) -> str:
+    # Әр сөз тырнақшаға алынады, сондықтан FTS5 синтаксисі (AND, *, ") инъекция бола алмайды
+    return " ".join('"' + token.replace('"', '""') + '"' for token in query.split())
+
+async def search_notes(db: AsyncSession, owner_id: int, query: str, limit: int, after: tuple[float, int] | None = None):
+    if db.get_bind().dialect.name == "postgresql":
+        search_vector = literal_column("notes.search_vector")
+        tsquery = func.websearch_to_tsquery("simple", query)
+        ranked = (
+            select(Note.id, Note.text, Note.created_at, Note.is_completed, func.ts_rank(search_vector, tsquery).label("rank"))
+            .where(Note.owner_id == owner_id, search_vector.op("@@")(tsquery))
+        )
+    else:
+        notes_fts = table("notes_fts", column("rowid"))
+        fts_match = literal_column("notes_fts")  # FTS5-те кесте атауы MATCH және bm25() аргументі
+        ranked = (
+            select(Note.id, Note.text, Note.created_at, Note.is_completed, (-func.bm25(fts_match)).label("rank"))
+            .join_from(Note, notes_fts, notes_fts.c.rowid == Note.id)
+            .where(Note.owner_id == owner_id, fts_match.op("MATCH")(_fts5_query(query)))
+        )
+
+    ranked = ranked.subquery()
+    stmt = select(ranked)
+    if after:
+        rank, note_id = after
+        stmt = stmt.where(or_(ranked.c.rank < rank, and_(ranked.c.rank == rank, ranked.c.id < note_id)))
+    stmt = stmt.order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit)
+
+    result = await db.execute(stmt)
+    return result.all()
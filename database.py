@@ -1,11 +1,60 @@
+import logging
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from prometheus_client import Counter, Gauge, Histogram
 from typing import AsyncGenerator
 from config import settings
 
 DATABASE_URL = settings.database_url
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Пулдан қосылым алу уақыты (бос қосылымды күту, жаңасын ашу және pre-ping)",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+db_pool_checkout_timeouts = Counter("db_pool_checkout_timeouts_total", "pool_timeout ішінде қосылым алынбаған сұраныстар")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Қосылым алу уақытын өлшейтін пул (пул өлшемін нақты жүктемеге сай таңдау үшін)."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - started)
+
+
+def _engine_options(url: str) -> dict:
+    # echo=True әр SQL-ді синхронды stdout-қа жазатын, ол орнына db_log_level қолданылады
+    options = {"echo": False}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # жадтағы SQLite бір қосылыммен (StaticPool) жұмыс істейді
+
+    options.update(
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+logging.getLogger("sqlalchemy.engine").setLevel(settings.db_log_level)
 
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
@@ -16,3 +65,33 @@ Base = declarative_base()
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+async def stream_partitions(stmt, batch_size: int) -> AsyncGenerator[list, None]:
+    """stmt нәтижесін server-side курсормен batch_size жолдық партиялар ретінде береді.
+
+    Жауап стримделіп жатқанда get_db сессиясы жабылып қалуы мүмкін, сондықтан жеке сессия
+    ашылады; yield_per арқасында жадта бір уақытта тек бір партия болады.
+    """
+    async with async_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+
+def _pool_stat(name: str) -> int:
+    stat = getattr(engine.pool, name, None)
+    return max(stat(), 0) if stat is not None else 0
+
+
+db_pool_checked_out = Gauge("db_pool_connections_checked_out", "Пулдан алынған (қолданыстағы) DB қосылымдары")
+db_pool_checked_out.set_function(lambda: _pool_stat("checkedout"))
+
+db_pool_idle = Gauge("db_pool_connections_idle", "Пулдағы бос DB қосылымдары")
+db_pool_idle.set_function(lambda: _pool_stat("checkedin"))
+
+db_pool_overflow = Gauge("db_pool_overflow", "pool_size-тан тыс ашылған (overflow) қосылымдар")
+db_pool_overflow.set_function(lambda: _pool_stat("overflow"))
+
+db_pool_size = Gauge("db_pool_size", "Пулдың тұрақты өлшемі (pool_size)")
+db_pool_size.set_function(lambda: _pool_stat("size"))
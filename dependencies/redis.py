@@ -1,12 +1,54 @@
 # dependencies/redis.py
-from redis.asyncio import Redis
-from redis.exceptions import RedisError
-from fastapi import Depends, HTTPException
+from redis.asyncio import BlockingConnectionPool, Redis
+from prometheus_client import Gauge
+from config import settings
+
+# ✅ Бүкіл процесске ортақ бір пул: сокеттер сұраныстар арасында қайта қолданылады
+_pool: BlockingConnectionPool | None = None
+_client: Redis | None = None
+
+
+def init_redis() -> Redis:
+    global _pool, _client
+    if _client is None:
+        _pool = BlockingConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            health_check_interval=30,
+            # Кэш дайын JSON байттарын (кейде gzip) сақтайды, сондықтан жауаптар декодталмайды
+            decode_responses=False,
+        )
+        _client = Redis(connection_pool=_pool)
+    return _client
+
+
+async def close_redis() -> None:
+    global _pool, _client
+    if _pool is not None:
+        await _pool.disconnect()
+    _pool = None
+    _client = None
+
 
 def get_redis() -> Redis:
-    try:
-        redis = Redis(host="localhost", port=6379, decode_responses=True)
-        return redis
-    except RedisError:
-        raise HTTPException(status_code=500, detail="Redis connection error")
+    # lifespan іске қосылмаған жағдайда (мысалы, тесттерде) пул алғаш сұраныста құрылады
+    return init_redis()
+
+
+def _pool_size(attr: str) -> int:
+    return len(getattr(_pool, attr, ())) if _pool is not None else 0
+
+
+redis_pool_in_use = Gauge("redis_pool_connections_in_use", "Redis пулынан алынған (бос емес) қосылымдар саны")
+redis_pool_in_use.set_function(lambda: _pool_size("_in_use_connections"))
+
+redis_pool_idle = Gauge("redis_pool_connections_idle", "Redis пулындағы бос қосылымдар саны")
+redis_pool_idle.set_function(lambda: _pool_size("_available_connections"))
 
+redis_pool_max = Gauge("redis_pool_max_connections", "Redis пулының ең үлкен өлшемі")
+redis_pool_max.set_function(lambda: settings.redis_max_connections)
@@ -0,0 +1,54 @@
+# local_cache.py
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Кілт, кортеж және OrderedDict түйінінің шамамен алғандағы қосымша көлемі
+ENTRY_OVERHEAD = 128
+
+
+class LocalCache:
+    """Процесс ішіндегі LRU кэш: жазбалар саны емес, жалпы көлемі (байт) бойынша шектеледі.
+
+    TTL қысқа — бұл тек Redis алдындағы қабат; негізгі тазарту pub/sub арқылы келеді,
+    ал TTL хабарлама жоғалған жағдайдағы сақтандыру.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, value: Any, size: int | None = None) -> None:
+        size = (len(value) if size is None else size) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,8 +1,25 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pythonjsonlogger import jsonlogger
 
+_listener: QueueListener | None = None
+
+
+class _InProcessQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Тек хабарламаны біріктіреміз (args кейін өзгеріп кетпеуі үшін).
+        # JSON форматтау listener ағынында; exc_info сол процесте қалады, сондықтан сақталады.
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
 def configure_logging():
+    global _listener
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
@@ -10,5 +27,22 @@ def configure_logging():
     formatter = jsonlogger.JsonFormatter('%(asctime)s %(levelname)s %(message)s')
     log_handler.setFormatter(formatter)
 
+    # ✅ Event loop тек кезекке салады; форматтау мен stdout-қа жазу фондық ағында
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+    _listener.start()
+
     logger.handlers = []
-    logger.addHandler(log_handler)
+    logger.addHandler(_InProcessQueueHandler(log_queue))
+
+
+def shutdown_logging():
+    """Кезектегі жазбаларды шығарып, фондық ағынды тоқтатады."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
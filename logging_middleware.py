@@ -1,23 +1,64 @@
 import logging
+import random
 import time
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
 
 logger = logging.getLogger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
 
-        logger.info(
+class LoggingMiddleware:
+    """Таза ASGI access-log.
+
+    Сәтті сұраныстар access_log_sample_rate үлесімен іріктеледі, ал баяу
+    сұраныстар мен 5xx/ерекше жағдайлар әрқашан жазылады.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float | None = None, slow_ms: float | None = None):
+        self.app = app
+        self.sample_rate = settings.access_log_sample_rate if sample_rate is None else sample_rate
+        self.slow_seconds = (settings.access_log_slow_ms if slow_ms is None else slow_ms) / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            process_time = time.perf_counter() - start_time
+            self._log(scope, status_code, process_time)
+
+    def _log(self, scope: Scope, status_code: int, process_time: float) -> None:
+        if status_code >= 500:
+            level = logging.ERROR
+        elif process_time >= self.slow_seconds:
+            level = logging.WARNING
+        elif self.sample_rate >= 1 or random.random() < self.sample_rate:
+            level = logging.INFO
+        else:
+            return
+
+        logger.log(
+            level,
             "Request",
             extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
                 "duration": f"{process_time:.4f}s"
             }
         )
-        return response
@@ -1,19 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import async_session, engine
 from models import Base, User
 from crud import get_user_by_username
 from schemas import UserCreate, UserLogin
-from utils import get_password_hash, verify_password, create_access_token, SECRET_KEY, ALGORITHM
+from utils import get_password_hash_async, verify_password_async, create_access_token, SECRET_KEY, ALGORITHM
 from utils import get_current_user, require_role
-from sqlalchemy import select
+from auth_cache import Principal
 from fastapi.staticfiles import StaticFiles
 from config import settings
 from prometheus_fastapi_instrumentator import Instrumentator
-import schemas, models
+import schemas, queries
 from routes import notes, tasks, ws
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pagination import decode_cursor
 from middleware.rate_limiter import RateLimiterMiddleware
+from dependencies.redis import init_redis, close_redis
+from broadcast import broadcaster
+from contextlib import asynccontextmanager
 
 # ✅ Logging + Prometheus
 
@@ -24,6 +28,19 @@ import logging
 
 print(settings.database_url)
 
+# ✅ DB Init + Redis пулы (lifespan)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    init_redis()
+    # Басқа воркерлердің кэш тазартуларына бірден жазылу (L1 кэш үшін)
+    await broadcaster.start()
+    yield
+    await broadcaster.close()
+    await close_redis()
+    await engine.dispose()
+
 # ✅ FastAPI init
 app = FastAPI(
     title="My Awesome API",
@@ -36,7 +53,8 @@ app = FastAPI(
     license_info={
         "name": "MIT",
         "url": "https://opensource.org/licenses/MIT",
-    }
+    },
+    lifespan=lifespan,
 )
 
 
@@ -64,12 +82,6 @@ app.include_router(notes.router)
 app.include_router(tasks.router)
 app.include_router(ws.router)
 
-# ✅ DB Init
-@app.on_event("startup")
-async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
 # ✅ DB Dependency
 async def get_db():
     async with async_session() as session:
@@ -95,10 +107,11 @@ async def get_db():
             }
         },
         400: {"description": "Қате сұраныс немесе қолданушы бұрыннан бар"},
+        503: {"description": "Құпиясөз хэштеу кезегі толы, кейінірек қайталаңыз"},
     }
 )
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     new_user = User(username=user.username, hashed_password=hashed_password, role="user")
     db.add(new_user)
     await db.commit()
@@ -127,15 +140,24 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
             }
         },
         401: {"description": "Қолданушы аты немесе құпиясөз қате"},
-        500: {"description": "Сервер қатесі"}
+        500: {"description": "Сервер қатесі"},
+        503: {"description": "Құпиясөз тексеру кезегі толы, кейінірек қайталаңыз"}
     }
 )
 async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
     db_user = await get_user_by_username(db, user.username)
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    verified, new_hash = False, None
+    if db_user:
+        verified, new_hash = await verify_password_async(user.password, db_user.hashed_password)
+    if not verified:
         logging.warning("Login failed", extra={"username": user.username})
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
+
+    # ✅ Ескі параметрлермен жасалған хэшті жаңа параметрлерге көшіру
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
     access_token = create_access_token(data={"sub": user.username})
     logging.info("User logged in", extra={"username": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -156,23 +178,35 @@ router = APIRouter()
         401: {"description": "Авторизация қажет"},
     }
 )
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 
 from fastapi import status
-from typing import List
 
 @app.get(
     "/admin/users",
     tags=["Admin"],
-    summary="Барлық қолданушыларды көру (тек админдерге)",
-    description="Бұл эндпоинт тек 'admin' рөлі бар қолданушыларға ғана рұқсат етілген. Барлық тіркелген қолданушылар тізімін қайтарады.",
-    response_model=List[schemas.UserOut],
+    summary="Қолданушылар тізімі (тек админдерге)",
+    description="Бұл эндпоинт тек 'admin' рөлі бар қолданушыларға ғана рұқсат етілген. Қолданушыларды username бойынша курсорлық (keyset) беттеумен қайтарады, prefix бойынша сүзуге болады. stream=true болса, барлық қолданушылар NDJSON ретінде стримделеді. approximate_total — COUNT(*)-сыз, кесте статистикасынан алынған шамамен сан.",
+    response_model=schemas.UserPage,
     responses={
         200: {
             "description": "Қолданушылар сәтті алынды",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "items": [{"id": 7, "username": "bigazy02"}],
+                        "next_cursor": None,
+                        "approximate_total": 1
+                    }
+                },
+                "application/x-ndjson": {
+                    "example": '{"id":7,"username":"bigazy02"}\n'
+                }
+            },
         },
+        400: {"description": "Курсор жарамсыз"},
         403: {
             "description": "Рұқсат жоқ (тек админдерге)",
             "content": {
@@ -184,9 +218,18 @@ from typing import List
     }
 )
 async def get_all_users(
+    limit: int = Query(50, ge=1, le=500, description="Бір беттегі қолданушылар саны"),
+    cursor: str | None = Query(None, max_length=200, description="Алдыңғы жауаптағы next_cursor мәні"),
+    prefix: str | None = Query(None, min_length=1, max_length=100, description="Username осы префикстен басталатындар"),
+    stream: bool = Query(False, description="Барлық қолданушыларды NDJSON ретінде стримдеу (беттеусіз)"),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
-    result = await db.execute(select(models.User))
-    users = result.scalars().all()
-    return users
+    if stream:
+        return StreamingResponse(queries.stream_users_ndjson(prefix), media_type="application/x-ndjson")
+
+    after = decode_cursor(cursor, 1)[0] if cursor else None
+    if after is not None and not isinstance(after, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Тек id/username бағандары, ORM entity-сіз және response_model валидациясыз
+    return Response(await queries.users_page_json(db, limit, after, prefix), media_type="application/json")
@@ -1,39 +1,258 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, HTTPException
-from redis import asyncio as aioredis
+import asyncio
+import logging
+import math
+import time
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from config import settings
+from dependencies.redis import get_redis
 
-class RateLimiterMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.redis = aioredis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            decode_responses=True
+logger = logging.getLogger(__name__)
+
+# ✅ GCRA: кілтте тек "theoretical arrival time" (TAT, мс) сақталады.
+# Тексеру, жазу және TTL бір атомарлы шақыруда — INCR/EXPIRE арасындағы жарыс жоқ.
+# Қайтарады: {allowed, remaining, retry_after_ms, reset_ms}
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local interval = period / limit
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.floor((period - (new_tat - now)) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+LIMIT_EXCEEDED_DETAIL = "Сұраныс шегі асқан. Кейінірек қайталап көріңіз."
+
+
+class RedisRateLimiter:
+    """Әр сұраныс Redis-ке бір EVALSHA жасайды — барлық воркерлер үшін дәл лимит."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._script = None
+
+    async def hit(self, key: str, limit: int) -> tuple[bool, int, float, float]:
+        redis = get_redis()  # ✅ маршруттармен ортақ пул
+        if self._script is None:
+            self._script = redis.register_script(GCRA_SCRIPT)
+        allowed, remaining, retry_after_ms, reset_ms = await self._script(
+            keys=[key], args=[self.window * 1000, limit], client=redis
         )
+        return bool(allowed), int(remaining), int(retry_after_ms) / 1000, int(reset_ms) / 1000
+
+    async def close(self) -> None:
+        pass
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "pending", "window_id", "local_total", "remote_seen")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.pending = 0       # соңғы синхрондаудан кейін жергілікті жұмсалған токендер
+        self.window_id = 0
+        self.local_total = 0   # осы терезеде осы воркер Redis-ке жіберген сан
+        self.remote_seen = 0   # осы терезеде басқа воркерлер жұмсағаны (соңғы көргеніміз)
+
+
+class LocalRateLimiter:
+    """Воркер ішіндегі token bucket, Redis-пен фонда пакетпен синхрондалады.
+
+    Сұраныс жолында желілік шақыру жоқ. Әр sync_interval сайын жергілікті
+    жұмсалған токендер Redis-ке бір pipeline-мен жіберіледі, ал басқа
+    воркерлердің жұмсағаны жергілікті bucket-тен шегеріледі. Сондықтан лимит
+    бүкіл воркерлер бойынша шамамен (бір синхрондау аралығы дәлдігімен) сақталады.
+    """
+
+    def __init__(self, window: int, sync_interval: float):
+        self.window = window
+        self.sync_interval = sync_interval
+        self._buckets: dict[tuple[str, int], _Bucket] = {}
+        self._task: asyncio.Task | None = None
+
+    async def hit(self, key: str, limit: int) -> tuple[bool, int, float, float]:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sync_loop())
+
+        now = time.monotonic()
+        rate = limit / self.window
+        bucket = self._buckets.get((key, limit))
+        if bucket is None:
+            bucket = self._buckets[(key, limit)] = _Bucket(limit, now)
+        else:
+            bucket.tokens = min(limit, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+
+        if bucket.tokens < 1:
+            return False, 0, (1 - bucket.tokens) / rate, (limit - bucket.tokens) / rate
+
+        bucket.tokens -= 1
+        bucket.pending += 1
+        return True, int(bucket.tokens), 0.0, (limit - bucket.tokens) / rate
+
+    async def sync(self) -> None:
+        """Жергілікті есептегіштерді Redis-ке жібереді және жалпы сандарды қайтарып алады."""
+        if not self._buckets:
+            return
+
+        window_id = int(time.time() // self.window)
+        now = time.monotonic()
+        batch = []
+        for (key, limit), bucket in list(self._buckets.items()):
+            if bucket.window_id != window_id:
+                bucket.window_id = window_id
+                bucket.local_total = 0
+                bucket.remote_seen = 0
+            elif not bucket.pending and now - bucket.updated > self.window:
+                del self._buckets[(key, limit)]  # ұзақ қолданылмаған bucket
+                continue
+            batch.append((key, limit, bucket, bucket.pending))
+            bucket.local_total += bucket.pending
+            bucket.pending = 0
+
+        redis = get_redis()
+        pipe = redis.pipeline(transaction=False)
+        for key, limit, bucket, pending in batch:
+            counter_key = f"ratelimit:sync:{key}:{limit}:{window_id}"
+            pipe.incrby(counter_key, pending)
+            pipe.expire(counter_key, self.window * 2)
 
-    async def dispatch(self, request: Request, call_next):
         try:
-            client_ip = request.client.host or "unknown"
-            path = request.url.path
-            key = f"ratelimit:{client_ip}:{path}"
-            ttl = settings.rate_limit_window
-            limit = settings.rate_limit
+            results = await pipe.execute()
+        except Exception:
+            for _, _, bucket, pending in batch:
+                bucket.local_total -= pending
+                bucket.pending += pending
+            raise
+
+        for (key, limit, bucket, _), total in zip(batch, results[::2]):
+            remote = int(total) - bucket.local_total
+            if remote > bucket.remote_seen:
+                bucket.tokens = max(bucket.tokens - (remote - bucket.remote_seen), 0.0)
+                bucket.remote_seen = remote
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.warning("Rate limiter sync failed", exc_info=True)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def _matches(path: str, prefix: str) -> bool:
+    prefix = prefix.rstrip("/")
+    return path == prefix or path.startswith(prefix + "/")
+
+
+class RateLimiterMiddleware:
+    """BaseHTTPMiddleware-сіз таза ASGI rate limiter.
+
+    mode="redis" — әр сұранысқа бір атомарлы Redis шақыруы (GCRA).
+    mode="local" — воркер ішіндегі token bucket + фондық пакеттік синхрондау.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: int | None = None,
+        window: int | None = None,
+        fail_open: bool | None = None,
+        mode: str | None = None,
+        exclude_paths: list[str] | None = None,
+        route_limits: dict[str, int] | None = None,
+    ):
+        self.app = app
+        self.limit = settings.rate_limit if limit is None else limit
+        self.window = window or settings.rate_limit_window
+        self.fail_open = settings.rate_limit_fail_open if fail_open is None else fail_open
+        self.exclude_paths = settings.rate_limit_exclude_paths if exclude_paths is None else exclude_paths
+        route_limits = settings.rate_limit_routes if route_limits is None else route_limits
+        # Ең ұзын префикс бірінші тексеріледі
+        self.route_limits = sorted(route_limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+        if (mode or settings.rate_limit_mode) == "local":
+            self.limiter = LocalRateLimiter(self.window, settings.rate_limit_sync_interval_ms / 1000)
+        else:
+            self.limiter = RedisRateLimiter(self.window)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.route_limits:
+            if _matches(path, prefix):
+                return limit
+        return self.limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            async def receive_with_shutdown() -> Message:
+                message = await receive()
+                if message["type"] == "lifespan.shutdown":
+                    await self.limiter.close()
+                return message
+
+            await self.app(scope, receive_with_shutdown, send)
+            return
+
+        path = scope.get("path", "")
+        if scope["type"] != "http" or any(_matches(path, prefix) for prefix in self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        key = f"ratelimit:{client_ip}:{path}"
+        limit = self._limit_for(path)
 
-            current = await self.redis.incr(key)
-            if current == 1:
-                await self.redis.expire(key, ttl)
+        if limit <= 0:
+            # 0 — жол толық жабық: GCRA мен bucket 0-ге бөлмеуі үшін бэкендке бармай 429
+            allowed, remaining, retry_after, reset = False, 0, self.window, self.window
+        else:
+            try:
+                allowed, remaining, retry_after, reset = await self.limiter.hit(key, limit)
+            except Exception:
+                logger.warning("Rate limiter backend unavailable", exc_info=True)
+                if self.fail_open:
+                    await self.app(scope, receive, send)
+                    return
+                response = JSONResponse({"detail": "Service temporarily unavailable"}, status_code=503)
+                await response(scope, receive, send)
+                return
 
-            if current > limit:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Сұраныс шегі асқан. Кейінірек қайталап көріңіз."
-                )
+        headers = [
+            (b"x-ratelimit-limit", str(limit).encode()),
+            (b"x-ratelimit-remaining", str(max(remaining, 0)).encode()),
+            (b"x-ratelimit-reset", str(math.ceil(reset)).encode()),
+        ]
 
-        except HTTPException:
-            raise  # лимит асса, тікелей көтереміз
+        if not allowed:
+            response = JSONResponse({"detail": LIMIT_EXCEEDED_DETAIL}, status_code=429)
+            response.raw_headers.extend(headers)
+            response.raw_headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+            await response(scope, receive, send)
+            return
 
-        except Exception as e:
-            print(f"[RateLimiter] Redis error: {e}")  # қосымша лог
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
 
-        return await call_next(request)
+        await self.app(scope, receive, send_with_headers)
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, DDL, Index, event
 from database import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -19,7 +19,60 @@ class Note(Base):
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # ETag үшін: ORM және Core UPDATE кезінде автоматты жаңарады
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="notes")
-    is_completed = Column(Boolean, default=False)
\ No newline at end of file
+    is_completed = Column(Boolean, default=False)
+
+
+# ✅ Қолданушы ескертпелерінің тізімі: WHERE owner_id = ? ORDER BY created_at DESC, id DESC
+# индекс ретімен оқылады (сорттаусыз, keyset курсоры индекс бойынша секіреді).
+# Екіншісі — тек аяқталмаған ескертпелерге арналған шағын жартылай индекс.
+Index("ix_notes_owner_created_id", Note.owner_id, Note.created_at.desc(), Note.id.desc())
+Index(
+    "ix_notes_owner_open_created_id",
+    Note.owner_id,
+    Note.created_at.desc(),
+    Note.id.desc(),
+    postgresql_where=Note.is_completed.is_not(True),
+    sqlite_where=Note.is_completed.is_not(True),
+)
+
+
+# ✅ /admin/users: username префиксі мен keyset-і код нүктелері ретімен (COLLATE "C") оқылады.
+# Postgres-те бағанның өз collation-ы locale-ге тәуелді, сондықтан жеке өрнектік индекс керек
+# (alembic: add_users_username_c_index миграциясымен бірдей). SQLite-те BINARY ретті unique индекс жеткілікті.
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL('CREATE INDEX ix_users_username_c ON users (username COLLATE "C")').execute_if(dialect="postgresql"),
+)
+
+
+# ✅ Толық мәтіндік іздеу (alembic: add_notes_full_text_search миграциясымен бірдей).
+# Postgres: GIN индексі бар генерацияланған tsvector бағаны.
+# SQLite (тесттер): сыртқы контентті FTS5 кестесі + синхрондау триггерлері.
+NOTES_FTS_DDL = {
+    "postgresql": [
+        "ALTER TABLE notes ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED",
+        "CREATE INDEX ix_notes_search_vector ON notes USING gin (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE notes_fts USING fts5(text, content='notes', content_rowid='id')",
+        "CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN "
+        "INSERT INTO notes_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER notes_fts_ad AFTER DELETE ON notes BEGIN "
+        "INSERT INTO notes_fts(notes_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+        "CREATE TRIGGER notes_fts_au AFTER UPDATE OF text ON notes BEGIN "
+        "INSERT INTO notes_fts(notes_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO notes_fts(rowid, text) VALUES (new.id, new.text); END",
+    ],
+}
+
+for dialect, statements in NOTES_FTS_DDL.items():
+    for statement in statements:
+        event.listen(Note.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+event.listen(Note.__table__, "before_drop", DDL("DROP TABLE IF EXISTS notes_fts").execute_if(dialect="sqlite"))
@@ -0,0 +1,23 @@
+# pagination.py
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    """Keyset мәндерін клиентке мөлдір емес (opaque) курсор ретінде береді."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
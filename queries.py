@@ -0,0 +1,93 @@
+# queries.py
+import sys
+from pydantic_core import to_json
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud
+from database import engine, stream_partitions
+from models import Note, User
+from pagination import encode_cursor
+
+# ✅ Оқуға арналған жеңіл жол: ORM entity құрылмайды, identity map-қа ештеңе түспейді.
+# Тек қажетті бағандар Core жолдары ретінде алынып, жауап JSON-ы тікелей құрылады
+# (NoteOut/UserOut пішімімен бірдей).
+_notes = Note.__table__
+_users = User.__table__
+
+NOTE_COLUMNS = (_notes.c.id, _notes.c.text, _notes.c.created_at, _notes.c.is_completed)
+USER_COLUMNS = (_users.c.id, _users.c.username)
+
+
+def note_items(rows) -> list[dict]:
+    return [
+        {"id": note_id, "text": text, "created_at": created_at, "is_completed": bool(is_completed)}
+        for note_id, text, created_at, is_completed in rows
+    ]
+
+
+async def notes_page_json(db: AsyncSession, owner_id: int, limit: int, after: tuple | None = None, **filters) -> bytes:
+    """GET /notes/ беті (NotePage) JSON байттары ретінде."""
+    stmt = crud.notes_page_query(owner_id, limit + 1, after, columns=NOTE_COLUMNS, **filters)
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
+
+    return to_json({"items": note_items(rows), "next_cursor": next_cursor})
+
+
+def _username_key(dialect: str):
+    # Префикс диапазоны код нүктелері ретін талап етеді: Postgres-тің locale collation-ында
+    # (en_US т.б.) 'lizzy' > 'liz{', сондықтан салыстыру да, сұрыптау да COLLATE "C" бойынша
+    # (ix_users_username_c индексі). SQLite-тің BINARY collation-ы онсыз да код нүктелік.
+    return _users.c.username.collate("C") if dialect == "postgresql" else _users.c.username
+
+
+def _username_filter(stmt, key, prefix: str | None):
+    if not prefix:
+        return stmt
+    stmt = stmt.where(key >= prefix, _users.c.username.startswith(prefix, autoescape=True))
+    if prefix[-1] != chr(sys.maxunicode):  # соңғы код нүктесінен кейін таңба жоқ — жоғарғы шексіз
+        stmt = stmt.where(key < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return stmt
+
+
+async def users_page_json(db: AsyncSession, limit: int, after: str | None = None, prefix: str | None = None) -> bytes:
+    """Қолданушылар беті (UserPage) username бойынша keyset-пен, JSON байттары ретінде."""
+    key = _username_key(db.bind.dialect.name)
+    stmt = _username_filter(select(*USER_COLUMNS), key, prefix)
+    if after is not None:
+        stmt = stmt.where(key > after)
+    rows = (await db.execute(stmt.order_by(key).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].username)
+
+    return to_json({
+        "items": [{"id": user_id, "username": username} for user_id, username in rows],
+        "next_cursor": next_cursor,
+        "approximate_total": await approximate_user_count(db),
+    })
+
+
+async def approximate_user_count(db: AsyncSession) -> int:
+    """COUNT(*) орнына кесте статистикасы: Postgres-те pg_class.reltuples, басқаларында max(id)."""
+    if db.bind.dialect.name == "postgresql":
+        estimate = await db.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass"))
+        if estimate is not None and estimate >= 0:  # ANALYZE жасалмаған кестеде -1
+            return estimate
+    # PK индексінің соңғы жазбасы — жойылған қолданушылар есебінен сәл артық болуы мүмкін
+    return await db.scalar(select(func.max(_users.c.id))) or 0
+
+
+async def stream_users_ndjson(prefix: str | None = None, batch_size: int = 1000):
+    """Барлық қолданушылар NDJSON ретінде: server-side курсор, жадта бір уақытта бір партия."""
+    key = _username_key(engine.dialect.name)
+    stmt = _username_filter(select(*USER_COLUMNS), key, prefix).order_by(key)
+    async for rows in stream_partitions(stmt, batch_size):
+        yield b"".join(to_json({"id": user_id, "username": username}) + b"\n" for user_id, username in rows)
@@ -1,16 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from database import get_db
-import models, schemas
+from database import get_db, stream_partitions
+import models, schemas, crud, queries
 from utils import get_current_user
-from typing import List
+from auth_cache import Principal
+from typing import List, Literal
 from dependencies.redis import get_redis
-import json
+import zlib
+from datetime import datetime, timezone
 from models import Note, User
 from schemas import NoteOut
 from redis.asyncio.client import Redis  # ✅ дұрыс импорт
 from celery_app import send_mock_email
+from pagination import encode_cursor, decode_cursor
+from conditional import notes_list_etag, note_etag, etag_matches, etag_headers, not_modified
+from cache import (
+    NOTES_CACHE_TTL,
+    NOTE_NEGATIVE_CACHE_TTL,
+    NOTE_NOT_FOUND,
+    notes_generation,
+    notes_cache_key,
+    note_cache_key,
+    invalidate_notes_cache,
+    pack_json,
+    cached_json_response,
+    read_through,
+)
+from routes.ws import publish_note_event
 
 router = APIRouter(prefix="/notes", tags=["Notes"])
 
@@ -36,62 +55,251 @@ router = APIRouter(prefix="/notes", tags=["Notes"])
 async def create_note(
     note: schemas.NoteCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     redis: Redis = Depends(get_redis)  # ✅ міндетті аргумент
 ):
-    new_note = Note(**note.dict(), owner_id=current_user.id)
-    db.add(new_note)
+    # INSERT ... RETURNING: жасалған жол refresh-сіз бір сапарда қайтады
+    new_note = await crud.create_note(db, current_user.id, note)
     await db.commit()
-    await db.refresh(new_note)
 
-    # ✅ Кэшті тазарту
-    pattern = f"notes:{current_user.id}:*"
-    keys = await redis.keys(pattern)
-    if keys:
-        await redis.delete(*keys)
+    # ✅ Кэшті тазарту (бұрын осы ID үшін сақталған теріс нәтиже де өшеді)
+    await invalidate_notes_cache(redis, current_user.id)
+    await publish_note_event(current_user.id, "created", note=new_note)
     return new_note
 
+# POST /notes/bulk
+@router.post(
+    "/bulk",
+    response_model=schemas.NoteBulkResponse,
+    summary="Ескертпелерді топтап жасау, жаңарту және жою",
+    description="Бір транзакцияда бірнеше ескертпені жасайды, жаңартады және жояды. Тек өз ескертпелеріңізге әсер етеді; әр элементтің нәтижесі қайтарылады.",
+    responses={
+        200: {
+            "description": "Топтық операция орындалды",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "results": [
+                            {"op": "create", "id": 3, "status": "ok", "note": {"id": 3, "text": "Жаңа", "created_at": "2024-05-03T10:00:00Z"}},
+                            {"op": "update", "id": 1, "status": "ok", "note": {"id": 1, "text": "Жаңартылған", "created_at": "2024-05-01T12:00:00Z"}},
+                            {"op": "delete", "id": 99, "status": "not_found", "note": None}
+                        ]
+                    }
+                }
+            }
+        },
+        401: {"description": "Авторизация қажет"},
+        422: {"description": "Валидация қатесі"}
+    },
+)
+async def bulk_notes(
+    payload: schemas.NoteBulkRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    redis: Redis = Depends(get_redis)
+):
+    texts = {item.id: item.text for item in payload.update}
+    created = await crud.bulk_create_notes(db, current_user.id, payload.create)
+    updated = {row.id: row for row in await crud.bulk_update_notes(db, current_user.id, texts)}
+    deleted = set(await crud.bulk_delete_notes(db, current_user.id, payload.delete))
+    await db.commit()
+
+    # ✅ Кэш бүкіл топ үшін бір рет тазартылады
+    if created or updated or deleted:
+        await invalidate_notes_cache(redis, current_user.id)
+    for row in created:
+        await publish_note_event(current_user.id, "created", note=row)
+    for row in updated.values():
+        await publish_note_event(current_user.id, "updated", note=row)
+    for note_id in deleted:
+        await publish_note_event(current_user.id, "deleted", note_id=note_id)
+
+    results = [{"op": "create", "id": row.id, "status": "ok", "note": row} for row in created]
+    for item in payload.update:
+        row = updated.get(item.id)
+        results.append({"op": "update", "id": item.id, "status": "ok" if row else "not_found", "note": row})
+    for note_id in payload.delete:
+        results.append({"op": "delete", "id": note_id, "status": "ok" if note_id in deleted else "not_found"})
+    return {"results": results}
+
 # GET /notes
 @router.get(
     "/",
-    response_model=list[schemas.NoteOut],
+    response_model=schemas.NotePage,
     summary="Барлық ескертпелерді алу",
-    description="Аутентификацияланған қолданушының барлық ескертпелерін қайтарады (кэш қолданылады).",
+    description="Аутентификацияланған қолданушының ескертпелерін курсорлық (keyset) беттеумен қайтарады, әдепкіде ең жаңалары бірінші. Орындалу күйі мен жасалған уақыт аралығы бойынша сүзгілер SQL-де (индекс бойынша) қолданылады; әр сүзгі комбинациясы жеке кэштеледі.",
     responses={
         200: {
             "description": "Ескертпелер тізімі сәтті қайтарылды",
             "content": {
                 "application/json": {
-                    "example": [
-                        {"id": 1, "text": "Сабаққа дайындалу", "created_at": "2024-05-01T12:00:00Z"},
-                        {"id": 2, "text": "Жаттығу жасау", "created_at": "2024-05-02T09:00:00Z"}
-                    ]
+                    "example": {
+                        "items": [
+                            {"id": 2, "text": "Жаттығу жасау", "created_at": "2024-05-02T09:00:00Z", "is_completed": False},
+                            {"id": 1, "text": "Сабаққа дайындалу", "created_at": "2024-05-01T12:00:00Z", "is_completed": True}
+                        ],
+                        "next_cursor": None
+                    }
                 }
             }
         },
+        400: {"description": "Курсор жарамсыз"},
         401: {"description": "Авторизация қажет"}
     },
 )
 async def get_notes(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    limit: int = Query(10, ge=1, le=100, description="Бір беттегі ескертпелер саны"),
+    cursor: str | None = Query(None, max_length=200, description="Алдыңғы жауаптағы next_cursor мәні"),
+    completed: bool | None = Query(None, description="Тек орындалған (true) немесе орындалмаған (false) ескертпелер"),
+    created_after: datetime | None = Query(None, description="Осы уақыттан бастап жасалғандар (қоса алғанда)"),
+    created_before: datetime | None = Query(None, description="Осы уақытқа дейін жасалғандар"),
+    order: Literal["desc", "asc"] = Query("desc", description="created_at бойынша сұрыптау бағыты"),
+    current_user: Principal = Depends(get_current_user),
     redis: Redis = Depends(get_redis),
 ):
-    cache_key = f"notes:{current_user.id}:list"
-    cached = await redis.get(cache_key)
-    if cached:
-        return json.loads(cached)
+    created_after, created_before = _as_utc(created_after), _as_utc(created_before)
+
+    # ✅ ETag буыннан алынады: өзгеріс болмаса 304, DB мен кэш денесі оқылмайды
+    generation = await notes_generation(redis, current_user.id)
+    etag = notes_list_etag(current_user.id, generation)
+    if matched := etag_matches(request, etag):
+        return not_modified(matched, vary=True)
+
+    # Әр бет өз кілтінде сақталады, буын ауысқанда бәрі бірге ескіреді
+    cache_key = await notes_cache_key(
+        redis, current_user.id, "list", limit, cursor or "",
+        "" if completed is None else int(completed),
+        created_after.isoformat() if created_after else "",
+        created_before.isoformat() if created_before else "",
+        order,
+        generation=generation,
+    )
+    after = decode_note_cursor(cursor) if cursor else None
+
+    async def load_page(db: AsyncSession) -> bytes:
+        return await queries.notes_page_json(
+            db, current_user.id, limit, after,
+            completed=completed,
+            created_after=created_after,
+            created_before=created_before,
+            ascending=order == "asc",
+        )
+
+    # ✅ Бір кілтке қатар келген сұраныстардан тек біреуі DB-ге барады; ескірген мән фонда жаңарады
+    cached = await read_through(redis, cache_key, load_page)
+    # json.loads/response_model айналымы жоқ: байттар сол күйінде жіберіледі
+    return cached_json_response(cached, request.headers.get("accept-encoding", ""), etag_headers(etag))
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # created_at бағанында уақыт белдеуісіз UTC сақталады
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def decode_note_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, note_id = decode_cursor(cursor, 2)
+    # bool — int-тің ішкі класы, сондықтан isinstance емес, нақты тип тексеріледі
+    if type(created_at) is not str or type(note_id) is not int:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        # Белдеулі уақыт naive бағанмен салыстырылмайды (asyncpg-де DataError -> 500)
+        return _as_utc(datetime.fromisoformat(created_at)), note_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# GET /notes/search
+@router.get(
+    "/search",
+    response_model=schemas.NotePage,
+    summary="Ескертпелерден толық мәтіндік іздеу",
+    description="Ескертпе мәтіні бойынша индекстелген іздеу. Нәтижелер релеванттылық бойынша сұрыпталады және курсормен беттеледі.",
+    responses={
+        200: {"description": "Іздеу нәтижелері"},
+        400: {"description": "Курсор жарамсыз"},
+        401: {"description": "Авторизация қажет"}
+    },
+)
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=200, description="Іздеу сөздері"),
+    limit: int = Query(10, ge=1, le=100, description="Бір беттегі нәтижелер саны"),
+    cursor: str | None = Query(None, max_length=200, description="Алдыңғы жауаптағы next_cursor мәні"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    if not q.split():
+        return {"items": [], "next_cursor": None}
+
+    after = None
+    if cursor:
+        rank, note_id = decode_cursor(cursor, 2)
+        # bool — int-тің ішкі класы, сондықтан isinstance емес, нақты тип тексеріледі
+        if type(rank) not in (int, float) or type(note_id) is not int:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (rank, note_id)
+
+    rows = await crud.search_notes(db, current_user.id, q, limit + 1, after)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+
+    return {"items": rows, "next_cursor": next_cursor}
+
+# GET /notes/export
+EXPORT_BATCH_SIZE = 1000
 
-    result = await db.execute(
-        select(Note).where(Note.owner_id == current_user.id).limit(10)
+async def _export_notes(owner_id: int, compress: bool):
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip форматы
+
+    stmt = (
+        select(*crud.NOTE_RETURNING)
+        .where(Note.owner_id == owner_id)
+        # ix_notes_owner_created_id кері бағытта оқылады: server-side курсорда сорттау жоқ
+        .order_by(Note.created_at, Note.id)
     )
-    notes = result.scalars().all()
-    serialized = [schemas.NoteOut.from_orm(note).model_dump() for note in notes]
+    async for rows in stream_partitions(stmt, EXPORT_BATCH_SIZE):
+        # Әр жол басқа эндпоинттармен бірдей NoteOut пішімінде (+ updated_at)
+        chunk = b"".join(to_json(schemas.NoteExport.model_validate(row)) + b"\n" for row in rows)
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
 
-    # ✅ Fix: datetime сериализациясын қолдау
-    await redis.set(cache_key, json.dumps(serialized, default=str), ex=300)
+    if compressor:
+        yield compressor.flush()
 
-    return serialized
+@router.get(
+    "/export",
+    summary="Барлық ескертпелерді NDJSON ретінде экспорттау",
+    description="Қолданушының барлық ескертпелерін жол-жолмен (NDJSON) стримдейді; gzip=true болса, gzip-пен сығылады. Жад көлемі ескертпелер санына тәуелсіз.",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Ескертпелер стримі",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id":1,"text":"Сабаққа дайындалу","created_at":"2024-05-01T12:00:00Z","is_completed":false,"updated_at":"2024-05-01T12:00:00Z"}\n'
+                },
+                "application/gzip": {}
+            }
+        },
+        401: {"description": "Авторизация қажет"}
+    },
+)
+async def export_notes(
+    gzip: bool = Query(False, description="NDJSON-ды gzip-пен сығу"),
+    current_user: Principal = Depends(get_current_user),
+):
+    filename = "notes.ndjson.gz" if gzip else "notes.ndjson"
+    return StreamingResponse(
+        _export_notes(current_user.id, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 # GET /notes/{note_id}
 @router.get(
@@ -114,14 +322,50 @@ async def get_notes(
 )
 async def get_note(
     note_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user),
+    redis: Redis = Depends(get_redis)
 ):
-    result = await db.execute(select(Note).where(Note.id == note_id))
-    note = result.scalar_one_or_none()
-    if not note or note.owner_id != current_user.id:
+    # ✅ Read-through кэш: ETag денемен бірге сақталады, сондықтан 304 DB-сіз қайтарылады.
+    # Бөгде/жоқ ID те қысқа уақытқа теріс нәтиже ретінде сақталады.
+    cache_key = await note_cache_key(redis, current_user.id, note_id)
+    etag, cached = await redis.hmget(cache_key, "etag", "body")
+    if cached == NOTE_NOT_FOUND:
         raise HTTPException(status_code=404, detail="Note not found")
-    return note
+    if cached:
+        etag = etag.decode()
+        # gzip-пен сақталған дене gzip қабылдайтын клиентке сол күйінде жіберіледі;
+        # etag_matches екі нұсқаның (identity/gzip) ETag-ын да таниды
+        if matched := etag_matches(request, etag):
+            return not_modified(matched, vary=True)
+        return cached_json_response(cached, request.headers.get("accept-encoding", ""), etag_headers(etag))
+
+    note = await get_owned_note(db, current_user.id, note_id)
+    if note is None:
+        await cache_note(redis, cache_key, NOTE_NOT_FOUND, ttl=NOTE_NEGATIVE_CACHE_TTL)
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    etag = note_etag(note.id, note.updated_at or note.created_at)
+    if matched := etag_matches(request, etag):
+        return not_modified(matched)
+
+    body = to_json(schemas.NoteOut.model_validate(note))
+    await cache_note(redis, cache_key, pack_json(body), etag=etag)
+    return Response(body, media_type="application/json", headers=etag_headers(etag))
+
+
+async def cache_note(redis: Redis, cache_key: str, body: bytes, etag: str = "", ttl: int = NOTES_CACHE_TTL):
+    pipe = redis.pipeline()
+    pipe.hset(cache_key, mapping={"etag": etag, "body": body})
+    pipe.expire(cache_key, ttl)
+    await pipe.execute()
+
+
+async def get_owned_note(db: AsyncSession, owner_id: int, note_id: int) -> Note | None:
+    # Иесі SQL шартында: бөгде ID үшін жол оқылмайды, PK индексімен бір іздеу
+    result = await db.execute(select(Note).where(Note.id == note_id, Note.owner_id == owner_id))
+    return result.scalar_one_or_none()
 
 # PUT /notes/{note_id}
 @router.put(
@@ -147,25 +391,26 @@ async def update_note(
     note_id: int,
     updated_note: schemas.NoteUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     redis: Redis = Depends(get_redis)
 ):
-    result = await db.execute(select(Note).where(Note.id == note_id))
-    note = result.scalar_one_or_none()
-    if not note or note.owner_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Note not found")
-
-    for key, value in updated_note.dict(exclude_unset=True).items():
-        setattr(note, key, value)
+    # UPDATE ... WHERE id AND owner_id RETURNING: SELECT/refresh жоқ, 404 қайтқан жолдан анықталады
+    values = updated_note.model_dump(exclude_unset=True, exclude_none=True)
+    if not values:
+        # Өзгеріс жоқ: UPDATE жоқ (onupdate updated_at/ETag-ты өзгертпейді), кэш буыны мен оқиға да жоқ
+        note = await get_owned_note(db, current_user.id, note_id)
+        if note is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return note
 
+    note = await crud.update_note(db, current_user.id, note_id, values)
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
     await db.commit()
-    await db.refresh(note)
 
     # ✅ Кэшті тазарту
-    pattern = f"notes:{current_user.id}:*"
-    keys = await redis.keys(pattern)
-    if keys:
-        await redis.delete(*keys)
+    await invalidate_notes_cache(redis, current_user.id)
+    await publish_note_event(current_user.id, "updated", note=note)
 
     return note
 
@@ -190,22 +435,17 @@ async def update_note(
 async def delete_note(
     note_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     redis: Redis = Depends(get_redis)
 ):
-    result = await db.execute(select(Note).where(Note.id == note_id))
-    note = result.scalar_one_or_none()
-    if not note or note.owner_id != current_user.id:
+    # DELETE ... RETURNING id: бір statement, 404 қайтқан жолдан анықталады
+    if not await crud.delete_note(db, current_user.id, note_id):
         raise HTTPException(status_code=404, detail="Note not found")
-
-    await db.delete(note)
     await db.commit()
 
     # ✅ Кэшті тазарту
-    pattern = f"notes:{current_user.id}:*"
-    keys = await redis.keys(pattern)
-    if keys:
-        await redis.delete(*keys)
+    await invalidate_notes_cache(redis, current_user.id)
+    await publish_note_event(current_user.id, "deleted", note_id=note_id)
 
     return {"detail": "Note deleted successfully"}
 
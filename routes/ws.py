@@ -1,24 +1,86 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from config import settings
+from broadcast import broadcaster
+from database import async_session
+from utils import get_current_user
+from auth_cache import Principal
+from schemas import NoteOut
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["WebSocket"])
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    """Әр клиентке шектеулі шығыс кезегі және жеке writer task.
+
+    broadcast тек кезектерге салады, сондықтан бір баяу сокет басқаларды
+    күттірмейді; кезегі толып кеткен клиент ажыратылады.
+    """
+
+    def __init__(self, queue_size: int | None = None):
+        self.queue_size = queue_size or settings.ws_queue_size
+        # websocket -> шығыс кезегі (хэш бойынша O(1) қосу/өшіру)
+        self.active_connections: dict[WebSocket, asyncio.Queue] = {}
+        self._writers: dict[WebSocket, asyncio.Task] = {}
+        self._closing: set[asyncio.Task] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.add(websocket)
+
+    def add(self, websocket: WebSocket):
+        """Қабылданған (accept) сокетті тіркейді; await жоқ, сондықтан тіркеу атомарлы."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.active_connections[websocket] = queue
+        self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        for websocket, queue in list(self.active_connections.items()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._evict(websocket)
+
+    def _evict(self, websocket: WebSocket):
+        logger.warning("WebSocket client evicted: outbound queue overflow")
+        self.disconnect(websocket)
+        task = asyncio.create_task(self._close(websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013 = Try Again Later; баяу клиент close-ты да ұстап қалмауы үшін timeout
+            await asyncio.wait_for(websocket.close(code=1013), settings.ws_close_timeout)
+        except Exception:
+            pass
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        try:
+            while True:
+                message = await queue.get()
+                await websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Жіберу сәтсіз болса, тек осы клиент ажыратылады
+            self.disconnect(websocket)
 
 manager = ConnectionManager()
 
+# ✅ Барлық воркерлердегі клиенттерге: хабарлама Redis pub/sub арқылы әр воркердің manager-іне келеді
+WS_BROADCAST_CHANNEL = "ws:broadcast"
+broadcaster.register(WS_BROADCAST_CHANNEL, manager.broadcast)
+
 @router.websocket(
     "/ws",
     name="WebSocket байланысы",
@@ -29,9 +91,98 @@ async def websocket_endpoint(websocket: WebSocket):
     description: Бұл WebSocket эндпоинты клиенттерге нақты уақытта хабарламаларды таратуға мүмкіндік береді. Әрбір қосылған клиент хабарлама жібере алады және барлық клиенттерге таратылады.
     """
     await manager.connect(websocket)
+    await broadcaster.start()
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"📢 {data}")
+            await broadcaster.publish(WS_BROADCAST_CHANNEL, f"📢 {data}")
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
+
+
+class NoteFeed:
+    """Қолданушы бойынша топталған WebSocket клиенттері (әр қолданушыға жеке ConnectionManager)."""
+
+    def __init__(self):
+        self._users: dict[int, ConnectionManager] = {}
+
+    async def connect(self, user_id: int, websocket: WebSocket):
+        # accept() алдымен: оны күткенде қолданушының соңғы сокеті ажырап, manager
+        # _users-тен өшірілуі мүмкін. Іздеу мен тіркеу арасында await жоқ.
+        await websocket.accept()
+        user_manager = self._users.get(user_id)
+        if user_manager is None:
+            user_manager = self._users[user_id] = ConnectionManager()
+        user_manager.add(websocket)
+
+    def disconnect(self, user_id: int, websocket: WebSocket):
+        user_manager = self._users.get(user_id)
+        if user_manager is None:
+            return
+        user_manager.disconnect(websocket)
+        if not user_manager.active_connections:
+            del self._users[user_id]
+
+    async def dispatch(self, message: str):
+        # Хабарлама пішімі: "<user_id>:<event JSON>" — тарату үшін JSON-ды қайта талдау қажет емес
+        user_id, _, event = message.partition(":")
+        user_manager = self._users.get(int(user_id))
+        if user_manager is not None:
+            await user_manager.broadcast(event)
+
+
+note_feed = NoteFeed()
+
+NOTE_FEED_CHANNEL = "notes:feed"
+broadcaster.register(NOTE_FEED_CHANNEL, note_feed.dispatch)
+
+
+async def publish_note_event(user_id: int, event_type: str, note=None, note_id: int | None = None):
+    """Ескертпе өзгерісін қолданушының барлық құрылғыларына (барлық воркерлер арқылы) жібереді."""
+    event = {"type": event_type}
+    if note is not None:
+        event["note"] = NoteOut.model_validate(note).model_dump(mode="json")
+    else:
+        event["id"] = note_id
+    await broadcaster.publish(NOTE_FEED_CHANNEL, f"{user_id}:{json.dumps(event, ensure_ascii=False)}")
+
+
+async def _authenticate(websocket: WebSocket) -> Principal | None:
+    # Браузерлер WebSocket-ке header қоса алмайды, сондықтан ?token= де қабылданады
+    token = websocket.query_params.get("token")
+    if not token:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+    try:
+        async with async_session() as db:
+            return await get_current_user(token, db)
+    except HTTPException:
+        return None
+
+
+@router.websocket(
+    "/ws/notes",
+    name="Ескертпе өзгерістерінің арнасы",
+)
+async def notes_feed_endpoint(websocket: WebSocket):
+    """
+    summary: Аутентификацияланған қолданушының ескертпе өзгерістері (нақты уақытта).
+    description: JWT токенімен (?token= немесе Authorization: Bearer) қосылады. Қолданушының ескертпелері жасалғанда, жаңартылғанда немесе жойылғанда {"type": "created"|"updated"|"deleted", ...} оқиғалары жіберіледі, сондықтан GET /notes/ арқылы поллинг қажет емес.
+    """
+    principal = await _authenticate(websocket)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await note_feed.connect(principal.id, websocket)
+    await broadcaster.start()
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        note_feed.disconnect(principal.id, websocket)
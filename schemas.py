@@ -1,6 +1,9 @@
 # schemas.py
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from datetime import datetime
+from typing import Literal
+
+BULK_MAX_ITEMS = 500
 
 class UserCreate(BaseModel):
     username: str = Field(..., description="Қолданушының логині", example="bigazy02")
@@ -17,6 +20,12 @@ class UserOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserPage(BaseModel):
+    items: list[UserOut] = Field(..., description="Ағымдағы беттегі қолданушылар (username бойынша сұрыпталған)")
+    next_cursor: str | None = Field(None, description="Келесі бетке арналған курсор (соңғы бетте null)", example="WyJiaWdhenkwMiJd")
+    approximate_total: int = Field(..., description="Қолданушылардың шамамен алынған жалпы саны (кесте статистикасынан)", example=1250)
+
+
 class UserRead(BaseModel):
     id: int
     username: str
@@ -24,14 +33,67 @@ class UserRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)  # Pydantic v2-де 'orm_mode' орнына
 
 class NoteCreate(BaseModel):
-    text: str = Field(..., description="Ескертпе мәтіні", example="Сабаққа дайындалу")
+    text: str = Field(..., min_length=1, description="Ескертпе мәтіні", example="Сабаққа дайындалу")
 
 class NoteUpdate(BaseModel):
-    text: str = Field(..., description="Жаңартылған ескертпе мәтіні", example="Жаттығу жасау")
+    text: str | None = Field(None, min_length=1, description="Жаңартылған ескертпе мәтіні", example="Жаттығу жасау")
+    is_completed: bool | None = Field(None, description="Ескертпе орындалды ма", example=True)
 
 class NoteOut(BaseModel):
     id: int = Field(..., description="Ескертпенің бірегей ID нөмірі", example=1)
     text: str = Field(..., description="Ескертпе мәтіні", example="Сабаққа дайындалу")
     created_at: datetime = Field(..., description="Ескертпе жасалған уақыт (UTC)", example="2024-05-01T12:00:00Z")
+    is_completed: bool = Field(False, description="Ескертпе орындалды ма", example=False)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("is_completed", mode="before")
+    @classmethod
+    def _null_is_open(cls, value):
+        # Ескі жолдарда баған NULL — аяқталмаған деп есептеледі
+        return bool(value)
+
+class NoteExport(NoteOut):
+    updated_at: datetime | None = Field(None, description="Соңғы өзгертілген уақыт (UTC); ескі жолдарда null", example="2024-05-02T08:30:00Z")
+
+class NotePage(BaseModel):
+    items: list[NoteOut] = Field(..., description="Ағымдағы беттегі ескертпелер")
+    next_cursor: str | None = Field(None, description="Келесі бетке арналған курсор (соңғы бетте null)", example="WyIyMDI0LTA1LTAxVDEyOjAwOjAwIiwxXQ")
+
+class NoteBulkUpdateItem(BaseModel):
+    id: int = Field(..., description="Жаңартылатын ескертпенің ID нөмірі", example=1)
+    text: str = Field(..., min_length=1, description="Жаңартылған ескертпе мәтіні", example="Жаттығу жасау")
+
+class NoteBulkRequest(BaseModel):
+    create: list[NoteCreate] = Field(default=[], max_length=BULK_MAX_ITEMS, description="Жасалатын ескертпелер")
+    update: list[NoteBulkUpdateItem] = Field(default=[], max_length=BULK_MAX_ITEMS, description="Жаңартылатын ескертпелер (ID-лер қайталанбауы керек)")
+    delete: list[int] = Field(default=[], max_length=BULK_MAX_ITEMS, description="Жойылатын ескертпелердің ID нөмірлері (қайталанбауы керек)")
+
+    # Бір топта бір ID екі рет келсе, нәтижесі анық емес (қайсы мәтін жазылды?) — 422
+    @field_validator("update")
+    @classmethod
+    def _unique_update_ids(cls, items):
+        _reject_duplicate_ids([item.id for item in items])
+        return items
+
+    @field_validator("delete")
+    @classmethod
+    def _unique_delete_ids(cls, note_ids):
+        _reject_duplicate_ids(note_ids)
+        return note_ids
+
+def _reject_duplicate_ids(note_ids: list[int]) -> None:
+    seen, duplicates = set(), set()
+    for note_id in note_ids:
+        (duplicates if note_id in seen else seen).add(note_id)
+    if duplicates:
+        raise ValueError(f"Duplicate note ids: {sorted(duplicates)}")
+
+class NoteBulkResult(BaseModel):
+    op: Literal["create", "update", "delete"] = Field(..., description="Операция түрі")
+    id: int = Field(..., description="Ескертпенің ID нөмірі", example=1)
+    status: Literal["ok", "not_found"] = Field(..., description="Операция нәтижесі")
+    note: NoteOut | None = Field(None, description="Жасалған/жаңартылған ескертпе")
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+class NoteBulkResponse(BaseModel):
+    results: list[NoteBulkResult] = Field(..., description="Әр элементтің нәтижесі (create, update, delete ретімен)")
@@ -11,3 +11,31 @@ async def test_login(client):
     response = await client.post("/login", json={"username": "testuser", "password": "testpass"})
     assert response.status_code == 200
     assert "access_token" in response.json()
+
+@pytest.mark.anyio
+async def test_login_rehashes_outdated_hash(client, db_session):
+    from sqlalchemy import select
+    from models import User
+    from utils import pwd_context
+
+    await client.post("/register", json={"username": "rehashuser", "password": "testpass"})
+    user = (await db_session.execute(select(User).where(User.username == "rehashuser"))).scalar_one()
+    user.hashed_password = pwd_context.hash("testpass", rounds=4)
+    await db_session.commit()
+
+    response = await client.post("/login", json={"username": "rehashuser", "password": "testpass"})
+    assert response.status_code == 200
+
+    await db_session.refresh(user)
+    assert not pwd_context.needs_update(user.hashed_password)
+
+@pytest.mark.anyio
+async def test_register_returns_503_when_hash_pool_saturated(client, monkeypatch):
+    import utils
+
+    monkeypatch.setattr(utils.settings, "password_hash_workers", 0)
+    monkeypatch.setattr(utils.settings, "password_hash_queue_size", 0)
+
+    response = await client.post("/register", json={"username": "busyuser", "password": "testpass"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
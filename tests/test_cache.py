@@ -0,0 +1,131 @@
+import asyncio
+import uuid
+import pytest
+import cache
+from dependencies.redis import get_redis
+
+def counting_loader(body: bytes, delay: float = 0.05):
+    calls = []
+
+    async def loader(db):
+        calls.append(db)
+        await asyncio.sleep(delay)
+        return body
+
+    return loader, calls
+
+@pytest.mark.anyio
+async def test_read_through_coalesces_concurrent_misses():
+    redis = get_redis()
+    key = f"test:{uuid.uuid4().hex}"
+    loader, calls = counting_loader(b'{"items": []}', delay=0.3)
+
+    values = await asyncio.gather(*(cache.read_through(redis, key, loader) for _ in range(10)))
+
+    assert len(calls) == 1
+    assert set(values) == {cache.pack_json(b'{"items": []}')}
+    assert await redis.get(key) == values[0]
+
+@pytest.mark.anyio
+async def test_read_through_waits_for_other_process_lock(monkeypatch):
+    monkeypatch.setattr(cache, "NOTES_CACHE_LOCK_POLL", 0.01)
+    redis = get_redis()
+    key = f"test:{uuid.uuid4().hex}"
+    loader, calls = counting_loader(b"[]")
+
+    # Басқа процесс құлыпты ұстап, мәнді құрып жатыр
+    await redis.set(f"{key}:lock", "other", px=5000)
+    reader = asyncio.create_task(cache.read_through(redis, key, loader))
+    await asyncio.sleep(0.05)
+    await redis.set(key, cache.pack_json(b"[1]"))
+
+    assert await asyncio.wait_for(reader, 1) == cache.pack_json(b"[1]")
+    assert calls == []
+
+@pytest.mark.anyio
+async def test_read_through_serves_stale_and_refreshes():
+    redis = get_redis()
+    key = f"test:{uuid.uuid4().hex}"
+    loader, calls = counting_loader(b"[2]", delay=0)
+
+    # Жұмсақ TTL өтіп кеткен мән
+    await redis.set(key, cache.pack_json(b"[1]"), ex=cache.NOTES_CACHE_STALE_TTL - 1)
+    assert await cache.read_through(redis, key, loader) == cache.pack_json(b"[1]")
+
+    for _ in range(50):
+        if await redis.get(key) == cache.pack_json(b"[2]"):
+            break
+        await asyncio.sleep(0.02)
+    assert await redis.get(key) == cache.pack_json(b"[2]")
+    assert len(calls) == 1
+    assert await redis.ttl(key) > cache.NOTES_CACHE_STALE_TTL
+
+def test_local_cache_evicts_by_size():
+    from local_cache import ENTRY_OVERHEAD, LocalCache
+
+    entry_size = 100 + len("a") + ENTRY_OVERHEAD
+    local = LocalCache(max_bytes=entry_size * 2, ttl=60)
+    local.put("a", b"x" * 100)
+    local.put("b", b"x" * 100)
+    local.get("a")  # "a" жақында қолданылды, "b" шығарылады
+    local.put("c", b"x" * 100)
+
+    assert local.get("b") is None
+    assert local.get("a") == local.get("c") == b"x" * 100
+    assert local.size == entry_size * 2
+
+    local.put("huge", b"x" * entry_size * 3)  # шектен үлкен мән сақталмайды
+    assert local.get("huge") is None
+
+@pytest.mark.anyio
+async def test_l1_serves_without_redis_and_drops_on_invalidation(monkeypatch):
+    redis = get_redis()
+    user_id = 10_000 + uuid.uuid4().int % 10_000
+    generation = await cache.notes_generation(redis, user_id)
+    key = await cache.notes_cache_key(redis, user_id, "list", generation=generation)
+    loader, calls = counting_loader(b"[]", delay=0)
+    value = await cache.read_through(redis, key, loader)
+
+    class Unreachable:
+        def __getattr__(self, name):
+            pytest.fail("Redis called on L1 hit")
+
+    # L1-де тұрғанда Redis-ке бармайды
+    assert await cache.notes_generation(Unreachable(), user_id) == generation
+    assert await cache.read_through(Unreachable(), key, loader) == value
+
+    # Басқа воркер жазды: pub/sub хабарламасы буынды L1-ден шығарады
+    await redis.incr(f"notes:{user_id}:gen")
+    await cache._on_invalidate(str(user_id))
+    assert await cache.notes_generation(redis, user_id) == generation + 1
+    assert len(calls) == 1
+
+@pytest.mark.anyio
+async def test_miss_during_stale_refresh_is_not_coalesced_onto_refresh():
+    redis = get_redis()
+    key = f"test:{uuid.uuid4().hex}"
+    loader, calls = counting_loader(b"[2]", delay=0.2)
+
+    await redis.set(key, cache.pack_json(b"[1]"), ex=cache.NOTES_CACHE_STALE_TTL - 1)
+    assert await cache.read_through(redis, key, loader) == cache.pack_json(b"[1]")
+    assert key in cache._refreshing
+
+    # Фондық жаңарту жүріп жатқанда кілт жоғалды (hard TTL / eviction)
+    cache.l1_cache.pop(key)
+    await redis.delete(key)
+    assert await asyncio.wait_for(cache.read_through(redis, key, loader), 2) == cache.pack_json(b"[2]")
+    assert key not in cache._inflight
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, *", False),
+    ("identity", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("", False),
+])
+def test_accepts_gzip_honours_q_values(header, expected):
+    assert cache.accepts_gzip(header) is expected
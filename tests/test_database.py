@@ -0,0 +1,29 @@
+import pytest
+from prometheus_client import REGISTRY
+from database import engine, InstrumentedPool
+
+@pytest.mark.anyio
+async def test_pool_checkout_is_measured():
+    assert isinstance(engine.pool, InstrumentedPool)
+    before = REGISTRY.get_sample_value("db_pool_checkout_seconds_count") or 0
+
+    async with engine.connect():
+        assert REGISTRY.get_sample_value("db_pool_connections_checked_out") >= 1
+
+    assert REGISTRY.get_sample_value("db_pool_checkout_seconds_count") == before + 1
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("filters", [{}, {"completed": False}, {"completed": True}, {"ascending": True}])
+async def test_notes_page_query_uses_owner_index(filters):
+    from datetime import datetime
+    from sqlalchemy import text
+    import crud
+
+    # Бірінші бет те, keyset беті де ix_notes_owner_* индексінің ретімен: сорттау қадамы (TEMP B-TREE) жоқ
+    for after in (None, (datetime(2024, 5, 1), 10)):
+        stmt = crud.notes_page_query(1, 11, after, **filters)
+        compiled = stmt.compile(engine.sync_engine, compile_kwargs={"literal_binds": True})
+        async with engine.connect() as conn:
+            plan = " ".join(row[-1] for row in await conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert "USING INDEX ix_notes_owner_" in plan
+        assert "TEMP B-TREE" not in plan
@@ -0,0 +1,39 @@
+import logging
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from logging_middleware import LoggingMiddleware
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+async def boom(request):
+    return PlainTextResponse("boom", status_code=503)
+
+inner_app = Starlette(routes=[Route("/ok", ok), Route("/boom", boom)])
+
+@pytest.mark.anyio
+async def test_access_log_sampling_keeps_errors(caplog):
+    app = LoggingMiddleware(inner_app, sample_rate=0, slow_ms=10_000)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="logging_middleware"):
+            await client.get("/ok")
+            await client.get("/boom")
+
+    records = [r for r in caplog.records if r.name == "logging_middleware"]
+    assert [r.path for r in records] == ["/boom"]
+    assert records[0].status_code == 503
+    assert records[0].levelno == logging.ERROR
+
+@pytest.mark.anyio
+async def test_access_log_slow_requests_always_logged(caplog):
+    app = LoggingMiddleware(inner_app, sample_rate=0, slow_ms=0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="logging_middleware"):
+            await client.get("/ok")
+
+    records = [r for r in caplog.records if r.name == "logging_middleware"]
+    assert len(records) == 1
+    assert records[0].levelno == logging.WARNING
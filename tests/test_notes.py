@@ -16,7 +16,56 @@ async def test_get_notes(client):
 
     response = await client.get("/notes/", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+
+@pytest.mark.anyio
+async def test_get_notes_pagination(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    for i in range(5):
+        await client.post("/notes/", json={"text": f"Page note {i}"}, headers=headers)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/notes/", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(note["id"] for note in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) >= 5
+
+@pytest.mark.anyio
+async def test_get_notes_invalid_cursor(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    token = login.json()["access_token"]
+
+    response = await client.get("/notes/", params={"cursor": "not-a-cursor"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+
+    from pagination import encode_cursor
+
+    for bad in (encode_cursor("2024-05-01T12:00:00", True), encode_cursor("2024-05-01T12:00:00", "7"), encode_cursor(1714564800, 7)):
+        response = await client.get("/notes/", params={"cursor": bad}, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 400
+
+def test_decode_note_cursor_normalises_to_naive_utc():
+    from datetime import datetime
+    from pagination import encode_cursor
+    from routes.notes import decode_note_cursor
+
+    assert decode_note_cursor(encode_cursor("2024-05-01T17:00:00+05:00", 7)) == (datetime(2024, 5, 1, 12, 0), 7)
+    assert decode_note_cursor(encode_cursor("2024-05-01T12:00:00", 7)) == (datetime(2024, 5, 1, 12, 0), 7)
 
 @pytest.mark.anyio
 async def test_get_single_note(client):
@@ -56,3 +105,323 @@ async def test_delete_note(client):
 
     response = await client.get(f"/notes/{note_id}", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 404
+
+@pytest.mark.anyio
+async def test_get_notes_cache_invalidated_on_write(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    await client.get("/notes/", headers=headers)
+    create_resp = await client.post("/notes/", json={"text": "Fresh note"}, headers=headers)
+    note_id = create_resp.json()["id"]
+
+    response = await client.get("/notes/", headers=headers)
+    assert response.json()["items"][0]["id"] == note_id
+
+    await client.delete(f"/notes/{note_id}", headers=headers)
+    response = await client.get("/notes/", headers=headers)
+    assert note_id not in [note["id"] for note in response.json()["items"]]
+
+@pytest.mark.anyio
+async def test_bulk_notes(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    existing = await client.post("/notes/", json={"text": "Bulk existing"}, headers=headers)
+    existing_id = existing.json()["id"]
+
+    response = await client.post("/notes/bulk", json={
+        "create": [{"text": "Bulk 1"}, {"text": "Bulk 2"}],
+        "update": [{"id": existing_id, "text": "Bulk updated"}, {"id": 999999, "text": "Missing"}],
+        "delete": [999998],
+    }, headers=headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert [(r["op"], r["status"]) for r in results] == [
+        ("create", "ok"), ("create", "ok"), ("update", "ok"), ("update", "not_found"), ("delete", "not_found"),
+    ]
+    assert [r["note"]["text"] for r in results[:2]] == ["Bulk 1", "Bulk 2"]
+    assert results[2]["note"]["text"] == "Bulk updated"
+
+    created_ids = [r["id"] for r in results[:2]]
+    response = await client.post("/notes/bulk", json={"delete": created_ids}, headers=headers)
+    assert [r["status"] for r in response.json()["results"]] == ["ok", "ok"]
+
+    response = await client.get(f"/notes/{created_ids[0]}", headers=headers)
+    assert response.status_code == 404
+    response = await client.get(f"/notes/{existing_id}", headers=headers)
+    assert response.json()["text"] == "Bulk updated"
+
+@pytest.mark.anyio
+async def test_export_notes_ndjson(client):
+    import gzip
+    import json
+
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.post("/notes/", json={"text": "Экспорт жазбасы"}, headers=headers)
+
+    response = await client.get("/notes/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    notes = [json.loads(line) for line in response.text.splitlines()]
+    exported = next(note for note in notes if note["text"] == "Экспорт жазбасы")
+    assert exported["is_completed"] is False
+    assert exported["updated_at"] is not None
+    assert set(exported) == {"id", "text", "created_at", "is_completed", "updated_at"}
+
+    response = await client.get("/notes/export", params={"gzip": "true"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    compressed = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert compressed == notes
+
+@pytest.mark.anyio
+async def test_search_notes(client):
+    from pagination import encode_cursor
+
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    texts = ["Кітап оқу жоспары", "Кітап сатып алу", "Кітап кітап кітап тізімі", "Дүкенге бару"]
+    for text in texts:
+        await client.post("/notes/", json={"text": text}, headers=headers)
+
+    response = await client.get("/notes/search", params={"q": "кітап"}, headers=headers)
+    assert response.status_code == 200
+    found = [note["text"] for note in response.json()["items"]]
+    assert sorted(found) == sorted(texts[:3])
+    assert found[0] == "Кітап кітап кітап тізімі"  # ең релевантты бірінші
+
+    pages, cursor = [], None
+    while True:
+        params = {"q": "кітап", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get("/notes/search", params=params, headers=headers)).json()
+        pages.extend(note["text"] for note in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == found
+
+    response = await client.get("/notes/search", params={"q": '"AND NOT'}, headers=headers)
+    assert response.status_code == 200
+
+    # JSON true/false Python-да int болып саналады — курсорда қабылданбауы керек
+    for values in ([True, 1], [1.0, False]):
+        response = await client.get("/notes/search", params={"q": "кітап", "cursor": encode_cursor(*values)}, headers=headers)
+        assert response.status_code == 400
+
+@pytest.mark.anyio
+async def test_search_returns_completion_status(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    done_id = (await client.post("/notes/", json={"text": "Велосипед жөндеу"}, headers=headers)).json()["id"]
+    open_id = (await client.post("/notes/", json={"text": "Велосипед сату"}, headers=headers)).json()["id"]
+    await client.put(f"/notes/{done_id}", json={"is_completed": True}, headers=headers)
+
+    response = await client.get("/notes/search", params={"q": "велосипед"}, headers=headers)
+    assert response.status_code == 200
+    status = {note["id"]: note["is_completed"] for note in response.json()["items"]}
+    assert status == {done_id: True, open_id: False}
+
+@pytest.mark.anyio
+async def test_get_note_cache_is_per_owner_and_invalidated(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.post("/register", json={"username": "otheruser", "password": "otherpass"})
+    login = await client.post("/login", json={"username": "otheruser", "password": "otherpass"})
+    other_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    note_id = (await client.post("/notes/", json={"text": "Cached note"}, headers=headers)).json()["id"]
+
+    # Бөгде қолданушы үшін 404 (теріс нәтиже кэштеледі), иесі үшін оқу кэштен
+    assert (await client.get(f"/notes/{note_id}", headers=other_headers)).status_code == 404
+    assert (await client.get(f"/notes/{note_id}", headers=other_headers)).status_code == 404
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).json()["text"] == "Cached note"
+
+    await client.put(f"/notes/{note_id}", json={"text": "Edited note"}, headers=headers)
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).json()["text"] == "Edited note"
+
+    await client.delete(f"/notes/{note_id}", headers=headers)
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).status_code == 404
+
+@pytest.mark.anyio
+async def test_late_note_cache_fill_does_not_outlive_invalidation(client, monkeypatch):
+    from routes import notes as notes_routes
+
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    note_id = (await client.post("/notes/", json={"text": "Before race"}, headers=headers)).json()["id"]
+
+    get_owned_note = notes_routes.get_owned_note
+
+    async def slow_read(db, owner_id, note_id):
+        # Ескі жол оқылды, кэш толтырылғанша басқа сұраныс ескертпені өзгертеді
+        note = await get_owned_note(db, owner_id, note_id)
+        await client.put(f"/notes/{note_id}", json={"text": "After race"}, headers=headers)
+        return note
+
+    monkeypatch.setattr(notes_routes, "get_owned_note", slow_read)
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).json()["text"] == "Before race"
+    monkeypatch.setattr(notes_routes, "get_owned_note", get_owned_note)
+
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).json()["text"] == "After race"
+
+@pytest.mark.anyio
+async def test_get_notes_serves_cached_bytes(client, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "notes_cache_compress_min_bytes", 0)
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.post("/notes/", json={"text": "Compressed cache"}, headers=headers)
+
+    miss = await client.get("/notes/?limit=5", headers=headers)
+    hit = await client.get("/notes/?limit=5", headers={**headers, "Accept-Encoding": "gzip"})
+    plain = await client.get("/notes/?limit=5", headers={**headers, "Accept-Encoding": "identity"})
+
+    assert miss.headers["content-encoding"] == "gzip"
+    assert hit.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert miss.json() == hit.json() == plain.json()
+
+    # gzip және identity денелерінің strong ETag-тары әртүрлі, бірақ екеуі де 304 береді
+    assert hit.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert hit.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+    for response in (hit, plain):
+        revalidated = await client.get("/notes/?limit=5", headers={**headers, "If-None-Match": response.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == response.headers["etag"]
+    assert miss.json()["items"][0]["text"] == "Compressed cache"
+
+@pytest.mark.anyio
+async def test_get_note_serves_cached_gzip_bytes(client, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "notes_cache_compress_min_bytes", 0)
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    note_id = (await client.post("/notes/", json={"text": "Compressed note"}, headers=headers)).json()["id"]
+
+    miss = await client.get(f"/notes/{note_id}", headers=headers)
+    hit = await client.get(f"/notes/{note_id}", headers={**headers, "Accept-Encoding": "gzip"})
+    plain = await client.get(f"/notes/{note_id}", headers={**headers, "Accept-Encoding": "identity"})
+
+    assert hit.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert miss.json() == hit.json() == plain.json()
+    assert hit.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"' == miss.headers["etag"][:-1] + '-gzip"'
+    for response in (hit, plain):
+        revalidated = await client.get(f"/notes/{note_id}", headers={**headers, "If-None-Match": response.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == response.headers["etag"]
+
+@pytest.mark.anyio
+async def test_notes_conditional_get(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    note_id = (await client.post("/notes/", json={"text": "ETag note"}, headers=headers)).json()["id"]
+
+    for url in ("/notes/", f"/notes/{note_id}"):
+        first = await client.get(url, headers=headers)
+        etag = first.headers["etag"]
+        # Өзгеріс болмаса, қайталап сұрағанда да 304
+        for _ in range(2):
+            response = await client.get(url, headers={**headers, "If-None-Match": etag})
+            assert response.status_code == 304
+            assert response.headers["etag"] == etag
+            assert response.content == b""
+
+        await client.put(f"/notes/{note_id}", json={"text": f"ETag note {url}"}, headers=headers)
+        response = await client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+@pytest.mark.anyio
+async def test_get_notes_filters_and_order(client):
+    await client.post("/register", json={"username": "filteruser", "password": "filterpass"})
+    login = await client.post("/login", json={"username": "filteruser", "password": "filterpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    ids = [(await client.post("/notes/", json={"text": f"Task {i}"}, headers=headers)).json()["id"] for i in range(4)]
+    response = await client.put(f"/notes/{ids[1]}", json={"is_completed": True}, headers=headers)
+    assert response.json()["is_completed"] is True
+    assert response.json()["text"] == "Task 1"
+
+    async def listed(**params):
+        response = await client.get("/notes/", params=params, headers=headers)
+        return [note["id"] for note in response.json()["items"]]
+
+    assert await listed() == ids[::-1]
+    assert await listed(completed="true") == [ids[1]]
+    # Кэштелген "open" көрінісі жазудан кейін жаңарады
+    assert await listed(completed="false") == [ids[3], ids[2], ids[0]]
+    await client.put(f"/notes/{ids[3]}", json={"is_completed": True}, headers=headers)
+    assert await listed(completed="false") == [ids[2], ids[0]]
+
+    assert await listed(order="asc", limit=2) == ids[:2]
+    first_page = (await client.get("/notes/", params={"order": "asc", "limit": 2}, headers=headers)).json()
+    assert await listed(order="asc", limit=2, cursor=first_page["next_cursor"]) == ids[2:]
+
+    notes = (await client.get("/notes/", params={"order": "asc"}, headers=headers)).json()["items"]
+    assert await listed(created_after=notes[2]["created_at"]) == [ids[3], ids[2]]
+    assert await listed(created_before=notes[2]["created_at"], order="asc") == ids[:2]
+
+@pytest.mark.anyio
+async def test_update_and_delete_other_users_note_returns_404(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    login = await client.post("/login", json={"username": "otheruser", "password": "otherpass"})
+    other_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    created = (await client.post("/notes/", json={"text": "Mine"}, headers=headers)).json()
+    assert created["is_completed"] is False
+
+    assert (await client.put(f"/notes/{created['id']}", json={"text": "Theirs"}, headers=other_headers)).status_code == 404
+    assert (await client.delete(f"/notes/{created['id']}", headers=other_headers)).status_code == 404
+
+    response = await client.put(f"/notes/{created['id']}", json={}, headers=headers)
+    assert response.json() == created
+    assert (await client.delete(f"/notes/{created['id']}", headers=headers)).status_code == 200
+    assert (await client.delete(f"/notes/{created['id']}", headers=headers)).status_code == 404
+
+@pytest.mark.anyio
+async def test_bulk_notes_rejects_empty_text_and_duplicate_ids(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    note_id = (await client.post("/notes/", json={"text": "Bulk dup"}, headers=headers)).json()["id"]
+
+    for payload in (
+        {"create": [{"text": ""}]},
+        {"update": [{"id": note_id, "text": ""}]},
+        {"update": [{"id": note_id, "text": "a"}, {"id": note_id, "text": "b"}]},
+        {"delete": [note_id, note_id]},
+    ):
+        response = await client.post("/notes/bulk", json=payload, headers=headers)
+        assert response.status_code == 422
+    assert (await client.post("/notes/", json={"text": ""}, headers=headers)).status_code == 422
+
+    assert (await client.get(f"/notes/{note_id}", headers=headers)).json()["text"] == "Bulk dup"
+
+@pytest.mark.anyio
+async def test_empty_update_does_not_write(client):
+    login = await client.post("/login", json={"username": "testuser", "password": "testpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    note_id = (await client.post("/notes/", json={"text": "Untouched"}, headers=headers)).json()["id"]
+
+    note_etag = (await client.get(f"/notes/{note_id}", headers=headers)).headers["etag"]
+    list_etag = (await client.get("/notes/", headers=headers)).headers["etag"]
+
+    # null өрістер де "өзгеріс жоқ" деп есептеледі (exclude_none)
+    for payload in ({}, {"text": None}, {"is_completed": None}, {"text": None, "is_completed": None}):
+        response = await client.put(f"/notes/{note_id}", json=payload, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["text"] == "Untouched"
+
+    # updated_at да, қолданушы буыны да өзгермеген: екі ETag бойынша 304
+    assert (await client.get(f"/notes/{note_id}", headers={**headers, "If-None-Match": note_etag})).status_code == 304
+    assert (await client.get("/notes/", headers={**headers, "If-None-Match": list_etag})).status_code == 304
+    assert (await client.put("/notes/999999", json={}, headers=headers)).status_code == 404
@@ -13,3 +13,65 @@ async def test_get_me_authorized(client):
     response = await client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
     assert response.status_code == 200
     assert response.json()["username"] == "testuser"
+
+@pytest.mark.anyio
+async def test_principal_cache_lru_and_invalidation():
+    from auth_cache import Principal, PrincipalCache
+
+    cache = PrincipalCache(max_size=2, ttl=60)
+    cache.put(Principal(id=1, username="a", role="user"))
+    cache.put(Principal(id=2, username="b", role="user"))
+    assert cache.get("a").id == 1  # "a" соңғы қолданылған болады
+    cache.put(Principal(id=3, username="c", role="admin"))
+
+    assert cache.get("b") is None
+    assert cache.get("c").role == "admin"
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    expired = PrincipalCache(max_size=2, ttl=0)
+    expired.put(Principal(id=1, username="a", role="user"))
+    assert expired.get("a") is None
+
+@pytest.mark.anyio
+async def test_admin_users_keyset_prefix_and_stream(client, db_session):
+    import json
+    from sqlalchemy import update
+    from models import User
+
+    for name in ("adm_root", "adm_alice", "adm_bob", "adm_carol", "admx_other", "liz", "lizzy", "liz9", "lizard"):
+        await client.post("/register", json={"username": name, "password": "adminpass"})
+    await db_session.execute(update(User).where(User.username == "adm_root").values(role="admin"))
+    await db_session.commit()
+
+    login = await client.post("/login", json={"username": "adm_root", "password": "adminpass"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    usernames, cursor = [], None
+    while True:
+        params = {"prefix": "adm_", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/admin/users", params=params, headers=headers)).json()
+        usernames += [user["username"] for user in page["items"]]
+        assert page["approximate_total"] >= 5
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert usernames == ["adm_alice", "adm_bob", "adm_carol", "adm_root"]
+
+    response = await client.get("/admin/users", params={"prefix": "adm_", "stream": "true"}, headers=headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["username"] for line in response.text.splitlines()] == usernames
+
+    # Соңғы таңбасы 'z' префикс: жоғарғы шек 'liz{' — locale collation-да 'lizzy'-ден кіші
+    response = await client.get("/admin/users", params={"prefix": "liz"}, headers=headers)
+    assert [user["username"] for user in response.json()["items"]] == ["liz", "liz9", "lizard", "lizzy"]
+    response = await client.get("/admin/users", params={"prefix": "liz", "stream": "true"}, headers=headers)
+    assert [json.loads(line)["username"] for line in response.text.splitlines()] == ["liz", "liz9", "lizard", "lizzy"]
+
+    response = await client.get("/admin/users", params={"prefix": "adm_\U0010ffff"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    response = await client.get("/admin/users", params={"cursor": "bad"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,107 @@
+import uuid
+import pytest
+from httpx import AsyncClient, ASGITransport
+from redis.asyncio import Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+import middleware.rate_limiter as rate_limiter
+from middleware.rate_limiter import RateLimiterMiddleware
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+# Әр тест өз жолын қолданады, сондықтан Redis-тегі кілттер қиылыспайды
+inner_app = Starlette(routes=[Route("/{name}", ok)])
+
+def make_client(**kwargs):
+    transport = ASGITransport(app=RateLimiterMiddleware(inner_app, **kwargs))
+    return AsyncClient(transport=transport, base_url="http://test")
+
+@pytest.mark.anyio
+async def test_rate_limit_headers_and_429():
+    path = f"/{uuid.uuid4().hex}"
+    async with make_client(limit=2, window=60) as client:
+        first = await client.get(path)
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "2"
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+
+        second = await client.get(path)
+        assert second.status_code == 200
+        assert second.headers["X-RateLimit-Remaining"] == "0"
+
+        third = await client.get(path)
+        assert third.status_code == 429
+        assert int(third.headers["Retry-After"]) >= 1
+        assert third.json()["detail"]
+
+@pytest.mark.anyio
+async def test_rate_limit_fail_policy(monkeypatch):
+    unreachable = Redis(port=1, socket_connect_timeout=0.1, retry=Retry(NoBackoff(), 0))
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: unreachable)
+    path = f"/{uuid.uuid4().hex}"
+
+    async with make_client(limit=2, window=60, fail_open=True) as client:
+        assert (await client.get(path)).status_code == 200
+
+    async with make_client(limit=2, window=60, fail_open=False) as client:
+        assert (await client.get(path)).status_code == 503
+
+@pytest.mark.anyio
+async def test_rate_limit_excluded_paths_and_route_limits():
+    name = uuid.uuid4().hex
+    async with make_client(limit=5, window=60, exclude_paths=[f"/skip-{name}"], route_limits={f"/strict-{name}": 1}) as client:
+        for _ in range(3):
+            response = await client.get(f"/skip-{name}")
+            assert response.status_code == 200
+            assert "X-RateLimit-Limit" not in response.headers
+
+        assert (await client.get(f"/strict-{name}")).headers["X-RateLimit-Limit"] == "1"
+        assert (await client.get(f"/strict-{name}")).status_code == 429
+
+@pytest.mark.anyio
+async def test_rate_limit_zero_blocks_without_backend(monkeypatch):
+    # Нақты берілген 0 әдепкі лимитке ауыспайды; Redis-ке де бармайды
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: pytest.fail("limit=0 must not reach Redis"))
+    path = f"/{uuid.uuid4().hex}"
+    for mode in ("redis", "local"):
+        async with make_client(limit=0, window=60, mode=mode) as client:
+            response = await client.get(path)
+            assert response.status_code == 429
+            assert response.headers["X-RateLimit-Limit"] == "0"
+            assert response.headers["Retry-After"] == "60"
+
+@pytest.mark.anyio
+async def test_local_rate_limit_mode(monkeypatch):
+    # Жергілікті режимде сұраныс жолында Redis қолданылмайды
+    monkeypatch.setattr(rate_limiter, "get_redis", lambda: pytest.fail("Redis called on request path"))
+    path = f"/{uuid.uuid4().hex}"
+    app = RateLimiterMiddleware(inner_app, limit=2, window=60, mode="local")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get(path)).status_code == 200
+        assert (await client.get(path)).status_code == 200
+        assert (await client.get(path)).status_code == 429
+    await app.limiter.close()
+
+@pytest.mark.anyio
+async def test_local_rate_limit_sync_across_workers():
+    key = f"ratelimit:test:{uuid.uuid4().hex}"
+    worker_a = rate_limiter.LocalRateLimiter(window=60, sync_interval=60)
+    worker_b = rate_limiter.LocalRateLimiter(window=60, sync_interval=60)
+
+    assert (await worker_b.hit(key, 3))[0]
+    await worker_b.sync()
+    assert (await worker_a.hit(key, 3))[0]
+    assert (await worker_a.hit(key, 3))[0]
+    await worker_a.sync()
+    await worker_b.sync()
+
+    # A воркері жұмсаған 2 токен B-ның bucket-інен де шегеріледі
+    allowed, *_ = await worker_b.hit(key, 3)
+    assert not allowed
+
+    await worker_a.close()
+    await worker_b.close()
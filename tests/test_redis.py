@@ -0,0 +1,33 @@
+import pytest
+import dependencies.redis as redis_dependency
+from dependencies.redis import close_redis, get_redis, init_redis
+
+@pytest.mark.anyio
+async def test_get_redis_shares_one_pool_until_closed(monkeypatch):
+    # Тест өз пулын құрады; басқа тесттердің ортақ клиенті teardown-да қалпына келеді
+    monkeypatch.setattr(redis_dependency, "_pool", None)
+    monkeypatch.setattr(redis_dependency, "_client", None)
+
+    client = get_redis()
+    assert get_redis() is client
+    assert init_redis() is client  # lifespan-дағы init_redis де сол клиентті береді
+    pool = client.connection_pool
+    assert pool is redis_dependency._pool
+
+    disconnected = []
+    disconnect = pool.disconnect
+
+    async def tracking_disconnect(*args, **kwargs):
+        disconnected.append(pool)
+        await disconnect(*args, **kwargs)
+
+    monkeypatch.setattr(pool, "disconnect", tracking_disconnect)
+
+    # lifespan shutdown: пул жабылады, келесі get_redis() жаңа пул құрады
+    await close_redis()
+    assert disconnected == [pool]
+
+    reopened = get_redis()
+    assert reopened is not client
+    assert reopened.connection_pool is not pool
+    await close_redis()
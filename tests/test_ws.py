@@ -0,0 +1,215 @@
+import asyncio
+import pytest
+from routes.ws import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed_with = None
+        self._unblocked = asyncio.Event()
+        if not blocked:
+            self._unblocked.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        await self._unblocked.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+class FakeClientWebSocket(FakeWebSocket):
+    """Эндпоинтті тікелей шақыруға арналған: query/header және клиенттің ажырауы."""
+
+    def __init__(self, query_params: dict | None = None, headers: dict | None = None):
+        super().__init__()
+        self.query_params = query_params or {}
+        self.headers = headers or {}
+        self.disconnected = asyncio.Event()
+
+    async def receive_text(self):
+        from starlette.websockets import WebSocketDisconnect
+
+        await self.disconnected.wait()
+        raise WebSocketDisconnect(1000)
+
+@pytest.mark.anyio
+async def test_broadcast_does_not_block_on_slow_client():
+    manager = ConnectionManager(queue_size=2)
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    await manager.connect(fast)
+    await manager.connect(slow)
+
+    # Баяу клиент бірінші хабарламада тұрып қалады, кезегі толған соң ажыратылады
+    for i in range(5):
+        await asyncio.wait_for(manager.broadcast(f"msg {i}"), timeout=1)
+        await asyncio.sleep(0)
+
+    await asyncio.sleep(0.01)
+    assert fast.sent == [f"msg {i}" for i in range(5)]
+    assert slow not in manager.active_connections
+    assert slow.closed_with == 1013
+    assert fast in manager.active_connections
+
+    manager.disconnect(fast)
+    assert not manager.active_connections
+
+@pytest.mark.anyio
+async def test_redis_broadcast_batches_and_coalesces():
+    import uuid
+    from broadcast import RedisBroadcast
+
+    channel = f"test:{uuid.uuid4().hex}"
+    received = []
+
+    async def handler(message):
+        received.append(message)
+
+    # Екі "воркер": біреуі жариялайды, екеуі де алады
+    worker_a = RedisBroadcast(flush_interval=0.01, max_batch=100)
+    worker_b = RedisBroadcast(flush_interval=0.01, max_batch=100)
+    worker_a.register(channel, handler)
+    worker_b.register(channel, handler)
+    await worker_a.start()
+    await worker_b.start()
+    await asyncio.sleep(0.1)  # жазылымдар орнағанша
+
+    await worker_a.publish(channel, "one")
+    await worker_a.publish(channel, "two")
+    await worker_a.publish(channel, "v1", coalesce_key="note:1")
+    await worker_a.publish(channel, "v2", coalesce_key="note:1")
+
+    for _ in range(100):
+        if len(received) >= 6:
+            break
+        await asyncio.sleep(0.02)
+
+    assert sorted(received) == sorted(["one", "two", "v2"] * 2)
+
+    await worker_a.close()
+    await worker_b.close()
+
+@pytest.mark.anyio
+async def test_note_feed_delivers_only_to_owner():
+    from routes.ws import NoteFeed
+
+    feed = NoteFeed()
+    alice_phone, alice_laptop, bob = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await feed.connect(1, alice_phone)
+    await feed.connect(1, alice_laptop)
+    await feed.connect(2, bob)
+
+    await feed.dispatch('1:{"type": "deleted", "id": 5}')
+    await feed.dispatch('3:{"type": "deleted", "id": 6}')  # қосылмаған қолданушы
+    await asyncio.sleep(0.01)
+
+    assert alice_phone.sent == alice_laptop.sent == ['{"type": "deleted", "id": 5}']
+    assert bob.sent == []
+
+    for user_id, websocket in ((1, alice_phone), (1, alice_laptop), (2, bob)):
+        feed.disconnect(user_id, websocket)
+    assert not feed._users
+
+@pytest.mark.anyio
+async def test_note_feed_keeps_socket_connecting_while_last_one_disconnects():
+    from routes.ws import NoteFeed
+
+    class SlowAcceptWebSocket(FakeWebSocket):
+        def __init__(self):
+            super().__init__()
+            self.accepting = asyncio.Event()
+            self.release = asyncio.Event()
+
+        async def accept(self):
+            self.accepting.set()
+            await self.release.wait()
+
+    feed = NoteFeed()
+    phone, laptop = FakeWebSocket(), SlowAcceptWebSocket()
+    await feed.connect(1, phone)
+
+    # Ноутбук accept()-ті күтіп тұрғанда телефон (соңғы сокет) ажырайды
+    connecting = asyncio.create_task(feed.connect(1, laptop))
+    await laptop.accepting.wait()
+    feed.disconnect(1, phone)
+    laptop.release.set()
+    await connecting
+
+    await feed.dispatch('1:{"type": "deleted", "id": 7}')
+    await asyncio.sleep(0.01)
+    assert laptop.sent == ['{"type": "deleted", "id": 7}']
+
+    feed.disconnect(1, laptop)
+    assert not feed._users
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("query_params, headers", [
+    ({}, {}),
+    ({"token": "invalid"}, {}),
+    ({}, {"authorization": "Bearer invalid"}),
+    ({}, {"authorization": "Basic abc"}),
+])
+async def test_note_feed_rejects_missing_or_invalid_token(query_params, headers):
+    from routes.ws import notes_feed_endpoint
+
+    websocket = FakeClientWebSocket(query_params, headers)
+    await asyncio.wait_for(notes_feed_endpoint(websocket), timeout=2)
+    assert websocket.closed_with == 1008
+
+@pytest.mark.anyio
+async def test_note_feed_delivers_published_event_to_authenticated_client(db_session):
+    import json
+    import uuid
+    from models import User
+    from routes.ws import note_feed, notes_feed_endpoint, publish_note_event
+    from utils import create_access_token
+
+    user = User(username=f"feed_{uuid.uuid4().hex[:8]}", hashed_password="x", role="user")
+    db_session.add(user)
+    await db_session.commit()
+
+    token = create_access_token({"sub": user.username})
+    websocket = FakeClientWebSocket(headers={"authorization": f"Bearer {token}"})
+    endpoint = asyncio.create_task(notes_feed_endpoint(websocket))
+    await asyncio.sleep(0.2)  # қосылу және pub/sub жазылымы орнағанша
+    assert websocket.closed_with is None
+
+    await publish_note_event(user.id, "deleted", note_id=42)
+    for _ in range(100):
+        if websocket.sent:
+            break
+        await asyncio.sleep(0.02)
+    assert [json.loads(message) for message in websocket.sent] == [{"type": "deleted", "id": 42}]
+
+    websocket.disconnected.set()
+    await asyncio.wait_for(endpoint, timeout=1)
+    assert user.id not in note_feed._users
+
+@pytest.mark.anyio
+async def test_redis_broadcast_flushes_full_batch_without_waiting_for_interval():
+    import uuid
+    from broadcast import RedisBroadcast
+
+    channel = f"test:{uuid.uuid4().hex}"
+    received = []
+
+    async def handler(message):
+        received.append(message)
+
+    worker = RedisBroadcast(flush_interval=30, max_batch=3)
+    worker.register(channel, handler)
+    await worker.start()
+    await asyncio.sleep(0.1)  # жазылым орнағанша
+
+    for i in range(3):
+        await worker.publish(channel, f"m{i}")
+
+    for _ in range(50):
+        if len(received) >= 3:
+            break
+        await asyncio.sleep(0.02)
+    assert received == ["m0", "m1", "m2"]
+
+    await worker.close()
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
@@ -10,6 +12,8 @@ import models
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from auth_cache import Principal, principal_cache
+from config import settings
 
 SECRET_KEY = "secret123"
 ALGORITHM = "HS256"
@@ -36,7 +40,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -44,9 +48,42 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+# ✅ bcrypt event loop-ты бұғаттамауы үшін жеке, өлшемі шектеулі пулда орындалады
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+async def _run_in_hash_pool(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_workers + settings.password_hash_queue_size:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Құпиясөзді тексереді; хэш ескірген болса (мысалы, rounds өзгерсе), жаңа хэшті қайтарады."""
+    return await _run_in_hash_pool(_verify_and_rehash, plain_password, hashed_password)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,17 +91,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
 
     token_data = verify_token(token, credentials_exception)
-    
-    stmt = select(models.User).where(models.User.username == token_data.username)
+
+    # ✅ Кэш табылса, users кестесіне сұраныс жіберілмейді
+    principal = principal_cache.get(token_data.username)
+    if principal is not None:
+        return principal
+
+    stmt = select(models.User.id, models.User.username, models.User.role).where(
+        models.User.username == token_data.username
+    )
     result = await db.execute(stmt)
-    user = result.scalars().first()
+    user = result.first()
 
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = Principal(id=user.id, username=user.username, role=user.role)
+    principal_cache.put(principal)
+    return principal
 
 def require_role(required_role: str):
-    def role_checker(current_user: models.User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,